@@ -0,0 +1,271 @@
+from __future__ import (annotations)
+
+from argparse import (ArgumentParser)
+from collections import (Counter)
+from functools import (lru_cache)
+from http.server import (BaseHTTPRequestHandler, ThreadingHTTPServer)
+from os import (path)
+from re import (sub)
+from string import (Template)
+from threading import (Lock, Thread)
+from time import (sleep)
+from urllib.parse import (parse_qs, urlsplit)
+
+FIXTURES_PATH: str = path.join(path.dirname(path.abspath(__file__)), 'fixtures')
+ROWS_PER_PAGE: int = 15
+LIST_TYPES: tuple = ('service_detail', 'recharge_detail', 'transfer_detail')
+LIST_HEADERS: dict = {
+    'service_detail': ('Inicio', 'Fin', 'Duraci&oacute;n', 'Subida', 'Descarga', 'Importe'),
+    'recharge_detail': ('Fecha', 'Importe', 'Canal', 'Tipo'),
+    'transfer_detail': ('Fecha', 'Importe', 'Destino')
+}
+CAPTCHA_IMAGE: bytes = b'\x89PNG\r\n\x1a\n' + bytes(2048)
+WRONG_PASSWORD: str = 'wrong'
+
+
+@lru_cache(maxsize=None)
+def fixture(name: str) -> Template:
+    with open(path.join(FIXTURES_PATH, f'{name}.html'), 'r', encoding='utf-8') as file:
+        return Template(file.read())
+
+
+def year_months(months: int, newest: str = '2022-12') -> list:
+    (year, month) = (int(part) for part in newest.split('-'))
+    result = []
+    for _ in range(months):
+        result.append(f'{year:04d}-{month:02d}')
+        (year, month) = (year, month - 1) if month > 1 else (year - 1, 12)
+    return result
+
+
+def history_row(list_type: str, year_month: str, index: int) -> tuple:
+    # Rows are numbered oldest first, so index 0 is the first session of the month.
+    (year, month) = year_month.split('-')
+    (day, minute) = (index // 48 % 28 + 1, index % 48 * 30)
+    (hour, minute) = (minute // 60, minute % 60)
+    date = f'{day:02d}/{month}/{year}'
+    if list_type == 'service_detail':
+        return (f'{date} {hour:02d}:{minute:02d}:00', f'{date} {hour:02d}:{minute + 29:02d}:{index % 60:02d}',
+                f'00:29:{index % 60:02d}', f'{index % 900 + 100},{index % 100:02d} KB',
+                f'{index % 90 + 1},{index % 100:02d} MB', f'${index % 3},{index % 100:02d}')
+    elif list_type == 'recharge_detail':
+        return (f'{date} {hour:02d}:{minute:02d}:00', f'${index % 5 * 5 + 5},00', 'Tarjeta', 'Recarga')
+    return (f'{date} {hour:02d}:{minute:02d}:00', f'${index % 10 + 1},00', f'user{index}@nauta.com.cu')
+
+
+@lru_cache(maxsize=4096)
+def render_detail_list(list_type: str, year_month: str, count: int, page: int) -> bytes:
+    # The portal lists every month newest first.
+    first = count - 1 - (page - 1) * ROWS_PER_PAGE
+    rows = (history_row(list_type, year_month, index) for index in range(first, max(first - ROWS_PER_PAGE, -1), -1))
+    return fixture('portal_detail_list').substitute(
+        headers=''.join(f'<th>{header}</th>' for header in LIST_HEADERS[list_type]),
+        rows='\n'.join('            <tr>' + ''.join(f'<td>{cell}</td>' for cell in row) + '</tr>' for row in rows)
+    ).encode('utf-8')
+
+
+@lru_cache(maxsize=1024)
+def render_detail_summary(list_type: str, count: int) -> bytes:
+    if list_type == 'service_detail':
+        values = (str(count), f'{count // 2:02d}:{count % 2 * 30:02d}:00', f'${count},00', f'{count * 550} KB',
+                  f'{count * 45},50 MB', f'{count * 46},04 MB')
+    else:
+        values = (str(count), f'${count * 5},00')
+    cards = ''.join(f'        <div class="col s12 m4"><div class="card"><div class="card-content">'
+                    f'<span class="card-stats-number">{value}</span></div></div></div>\n' for value in values)
+    return fixture('portal_detail_summary').substitute(cards=cards).encode('utf-8')
+
+
+def render_user_sessions(sessions: int) -> str:
+    return '\n'.join(f'    <tr><td>{day:02d}/12/2022 10:00:00</td><td>{day:02d}/12/2022 10:30:00</td>'
+                     f'<td>00:30:00</td></tr>' for day in range(1, sessions + 1))
+
+
+class MockNautaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: MockNautaServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def __send(self, body: bytes, status: int = 200, content_type: str = 'text/html; charset=utf-8',
+               headers: dict = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for (name, value) in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __redirect(self, location: str) -> None:
+        self.__send(b'', 302, headers={'Location': location})
+
+    def __page(self, name: str, **values) -> None:
+        self.__send(fixture(name).substitute(**values).encode('utf-8'))
+
+    def __route(self, method: str) -> None:
+        url = urlsplit(self.path)
+        route = sub('/+', '/', url.path)
+        data = parse_qs(url.query)
+        if method == 'POST':
+            length = int(self.headers.get('Content-Length', 0))
+            data.update(parse_qs(self.rfile.read(length).decode('utf-8')))
+        data = {key: values[0] for (key, values) in data.items()}
+
+        self.server.hit(f'{method} {"/".join(route.split("/")[:3]) or "/"}')
+        if self.server.latency:
+            sleep(self.server.latency)
+
+        handler = getattr(self, f'_{method.lower()}_{route.strip("/").split("/")[0] or "index"}', None)
+        if handler is None:
+            self.__send(b'Not Found', 404)
+        else:
+            handler(route, data)
+
+    def do_GET(self) -> None:
+        self.__route('GET')
+
+    def do_POST(self) -> None:
+        self.__route('POST')
+
+    # Captive portal (secure.etecsa.net:8443).
+
+    def _get_index(self, route: str, data: dict) -> None:
+        self.__page('nauta_homepage', wlanuserip='10.190.20.96', CSRFHW='a1b2c3d4e5f60718293a4b5c6d7e8f90')
+
+    def _post_LoginServlet(self, route: str, data: dict) -> None:
+        if data.get('password') == WRONG_PASSWORD:
+            self.__page('nauta_login_failed', reason='Entre el nombre de usuario y contraseña correctos.')
+        else:
+            self.__redirect(f'/web/online.do?CSRFHW={data.get("CSRFHW", "")}&username={data.get("username", "")}')
+
+    def _get_web(self, route: str, data: dict) -> None:
+        self.__page('nauta_online', ATTRIBUTE_UUID='7C3A9E1F5B2D4C6A8E0F1A3B5C7D9E1F', CSRFHW=data.get('CSRFHW', ''),
+                    wlanuserip='10.190.20.96', loggerId='20221201103000', username=data.get('username', ''))
+
+    def _post_EtecsaQueryServlet(self, route: str, data: dict) -> None:
+        if data.get('op') == 'getLeftTime':
+            self.__send(b'12:34:56', content_type='text/plain; charset=utf-8')
+        elif data.get('password') == WRONG_PASSWORD:
+            self.__page('nauta_login_failed', reason='Entre el nombre de usuario y contraseña correctos.')
+        else:
+            self.__page('nauta_query', credit='125,50', sessions=render_user_sessions(3))
+
+    def _get_LogoutServlet(self, route: str, data: dict) -> None:
+        self.__send(b"logoutcallback('SUCCESS');", content_type='text/plain; charset=utf-8')
+
+    # User portal (www.portal.nauta.cu).
+
+    def _get_user(self, route: str, data: dict) -> None:
+        self.__send(fixture('portal_login').substitute(csrf='4f1c2a9e8b7d6c5e', toastr='').encode('utf-8'),
+                    headers={'Set-Cookie': 'session=9d8c7b6a5f4e3d2c; Path=/; HttpOnly'})
+
+    def _post_user(self, route: str, data: dict) -> None:
+        if data.get('captcha') == WRONG_PASSWORD:
+            toastr = ("<script>toastr.error('<ul><li class=\"msg_error\">Se han detectado algunos errores.<ul>"
+                      "<li class=\"sub-message\">El c&oacute;digo captcha no es correcto.</li></ul></li></ul>');"
+                      "</script>")
+            self.__page('portal_login', csrf='4f1c2a9e8b7d6c5e', toastr=toastr)
+        else:
+            self.__redirect('/useraaa/user_info')
+
+    def _get_captcha(self, route: str, data: dict) -> None:
+        self.__send(CAPTCHA_IMAGE, content_type='image/png')
+
+    def _post_email(self, route: str, data: dict) -> None:
+        self._get_useraaa('/useraaa/user_info', data)
+
+    def _get_useraaa(self, route: str, data: dict) -> None:
+        parts = route.strip('/').split('/')[1:]
+        if parts == ['user_info']:
+            self.__page('portal_user_info', username='user@nauta.com.cu', blocking_date='2023-06-30',
+                        elimination_date='2023-09-28', available_balance='125,50', remaining_time='12:34:56',
+                        email_account='user@nauta.cu', toastr='')
+        elif len(parts) == 1 and parts[0] in LIST_TYPES:
+            options = '\n'.join(f'            <option value="{year_month}">{year_month}</option>'
+                                for year_month in self.server.year_months)
+            self.__page('portal_detail', csrf='4f1c2a9e8b7d6c5e', list_type_summary=f'{parts[0]}_summary',
+                        options=options)
+        elif len(parts) == 4 and parts[0].endswith('_list') and parts[0][:-5] in LIST_TYPES:
+            (list_type, year_month, count, page) = (parts[0][:-5], parts[1], int(parts[2]), int(parts[3]))
+            self.__send(render_detail_list(list_type, year_month, count, page))
+        else:
+            self.__send(b'Not Found', 404)
+
+    def _post_useraaa(self, route: str, data: dict) -> None:
+        parts = route.strip('/').split('/')[1:]
+        if len(parts) == 1 and parts[0].endswith('_summary') and parts[0][:-8] in LIST_TYPES:
+            count = self.server.rows_per_month if data.get('year_month') in self.server.year_months else 0
+            self.__send(render_detail_summary(parts[0][:-8], count))
+        else:
+            self._get_useraaa('/useraaa/user_info', data)
+
+
+class MockNautaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    year_months: list
+    rows_per_month: int
+    latency: float
+    hits: Counter
+    __hits_lock: Lock
+    __thread: Thread = None
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, months: int = 12, rows_per_month: int = 300,
+                 latency: float = 0.0) -> None:
+        super().__init__((host, port), MockNautaHandler)
+        self.year_months = year_months(months)
+        self.rows_per_month = rows_per_month
+        self.latency = latency
+        self.hits = Counter()
+        self.__hits_lock = Lock()
+
+    def __enter__(self) -> MockNautaServer:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        (host, port) = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def hit(self, endpoint: str) -> None:
+        with self.__hits_lock:
+            self.hits[endpoint] += 1
+
+    def start(self) -> None:
+        self.__thread = Thread(target=self.serve_forever, name='mock-nauta-server', daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self.__thread.join()
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Serve the Nauta captive portal and user portal from local fixtures.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--months', type=int, default=12, help='months of history per list type')
+    parser.add_argument('--rows-per-month', type=int, default=300, help='history rows in every month')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before every response')
+    arguments = parser.parse_args()
+
+    server = MockNautaServer(arguments.host, arguments.port, arguments.months, arguments.rows_per_month,
+                             arguments.latency)
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+from __future__ import (annotations)
+
+from argparse import (ArgumentParser)
+from asyncio import (run as run_async)
+from dataclasses import (asdict, dataclass)
+from gc import (collect)
+from json import (dump, load)
+from os import (path)
+from statistics import (mean, median)
+from subprocess import (PIPE, Popen)
+from sys import (exit, executable, path as sys_path)
+from time import (perf_counter)
+from tracemalloc import (get_traced_memory, start as start_tracing, stop as stop_tracing)
+from typing import (Any, Callable, Optional)
+
+sys_path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'src'))
+
+from stickNAUTA import (HistoryStore, NautaFleet, NautaSession, PortalNauta)  # noqa: E402
+from stickNAUTA import (analytics, export)  # noqa: E402
+from stickNAUTA._parsing import (parse_account_data, parse_details_rows, parse_user_info)  # noqa: E402
+
+try:
+    from stickNAUTA import (AsyncNautaSession, AsyncPortalNauta)
+    import aiohttp  # noqa: F401
+except ImportError:
+    AsyncNautaSession = AsyncPortalNauta = None
+
+from mock_server import (fixture, render_detail_list, render_user_sessions)  # noqa: E402
+
+USERNAME: str = 'user@nauta.com.cu'
+PASSWORD: str = 'password'
+
+
+@dataclass
+class Result(object):
+    name: str
+    repeat: int
+    mean_ms: float
+    median_ms: float
+    max_ms: float
+    ops_per_second: float
+    rows_per_second: Optional[float]
+    peak_memory_kib: float
+
+
+@dataclass
+class Benchmark(object):
+    name: str
+    function: Callable[[], Any]
+    setup: Callable[[], None] = None
+    counts_rows: bool = False
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Result:
+    if benchmark.setup is not None:
+        benchmark.setup()
+    benchmark.function()
+
+    timings = []
+    rows = None
+    for _ in range(repeat):
+        if benchmark.setup is not None:
+            benchmark.setup()
+        collect()
+        started = perf_counter()
+        rows = benchmark.function()
+        timings.append(perf_counter() - started)
+
+    # Peak memory is taken in a separate run because tracing skews the timings.
+    if benchmark.setup is not None:
+        benchmark.setup()
+    collect()
+    start_tracing()
+    try:
+        benchmark.function()
+        (_, peak) = get_traced_memory()
+    finally:
+        stop_tracing()
+
+    average = mean(timings)
+    return Result(benchmark.name, repeat, average * 1000, median(timings) * 1000, max(timings) * 1000,
+                  1 / average if average else float('inf'),
+                  rows / average if benchmark.counts_rows and average else None,
+                  peak / 1024)
+
+
+def build_benchmarks(url: str, workers: int, accounts: int) -> list:
+    benchmarks = []
+    state = {}
+
+    def add(name: str, function: Callable[[], Any], setup: Callable[[], None] = None,
+            counts_rows: bool = False) -> None:
+        benchmarks.append(Benchmark(name, function, setup, counts_rows))
+
+    # Pure parsing, no HTTP involved.
+    list_page = render_detail_list('service_detail', '2022-12', 300, 1)
+    query_page = fixture('nauta_query').substitute(credit='125,50', sessions=render_user_sessions(3)).encode('utf-8')
+    user_page = fixture('portal_user_info').substitute(
+        username=USERNAME, blocking_date='2023-06-30', elimination_date='2023-09-28', available_balance='125,50',
+        remaining_time='12:34:56', email_account='user@nauta.cu', toastr='').encode('utf-8')
+    add('parse: user info', lambda: parse_user_info(query_page, 'utf-8'))
+    add('parse: account data', lambda: parse_account_data(user_page, 'utf-8'))
+    add('parse: connection page', lambda: len(parse_details_rows(list_page, 'service_detail', encoding='utf-8')),
+        counts_rows=True)
+    add('parse: connection page (typed)',
+        lambda: len(parse_details_rows(list_page, 'service_detail', typed=True, encoding='utf-8')), counts_rows=True)
+
+    # Captive portal.
+    add('NautaSession()', lambda: NautaSession(USERNAME, PASSWORD, base_url=url))
+    add('NautaSession(acquire_user_info=False)',
+        lambda: NautaSession(USERNAME, PASSWORD, acquire_user_info=False, base_url=url))
+
+    def new_session() -> None:
+        state['session'] = NautaSession(USERNAME, PASSWORD, acquire_user_info=False, base_url=url)
+
+    def login_logout() -> None:
+        state['session'].login()
+        state['session'].logout()
+
+    add('NautaSession.login + logout', login_logout, new_session)
+
+    session = NautaSession(USERNAME, PASSWORD, base_url=url)
+    session.login()
+    add('NautaSession.get_remaining_time', lambda: session.get_remaining_time(in_seconds=True))
+    add('NautaSession.get_user_info(typed=True)', lambda: session.get_user_info(typed=True))
+
+    session_data = dict(session.get_session_data(), username=USERNAME)
+
+    def restore_session() -> None:
+        NautaSession(USERNAME, PASSWORD, base_url=url, lazy=True).set_session_data(session_data)
+
+    add('NautaSession(lazy=True).set_session_data', restore_session)
+
+    fleet_accounts = {f'user{index}@nauta.com.cu': PASSWORD for index in range(accounts)}
+
+    def fleet_login_logout() -> None:
+        fleet = NautaFleet(fleet_accounts, max_workers=workers, base_url=url)
+        for report in (fleet.login(), fleet.logout()):
+            if not report.ok:
+                raise next(iter(report.failures.values()))
+
+    add(f'NautaFleet.login + logout ({accounts} accounts)', fleet_login_logout)
+
+    # User portal.
+    add('PortalNauta()', lambda: PortalNauta(USERNAME, PASSWORD, base_url=url))
+
+    def new_portal() -> None:
+        state['portal'] = PortalNauta(USERNAME, PASSWORD, base_url=url)
+
+    add('PortalNauta.submit_captcha', lambda: state['portal'].submit_captcha('abcd'), new_portal)
+
+    portal = PortalNauta(USERNAME, PASSWORD, base_url=url)
+    portal.submit_captcha('abcd')
+    add('PortalNauta.get_captcha_image', portal.get_captcha_image)
+    add('PortalNauta.get_account_data', portal.get_account_data)
+
+    def count_rows(history: dict, rows_key: str) -> int:
+        return sum(len(month[rows_key]) for month in history.values())
+
+    for (method, rows_key) in (('get_connection_details', 'all_sessions'), ('get_recharge_details', 'all_recharges'),
+                               ('get_transfer_details', 'all_transfers')):
+        add(f'PortalNauta.{method}',
+            lambda method=method, rows_key=rows_key: count_rows(getattr(portal, method)(), rows_key),
+            counts_rows=True)
+        add(f'PortalNauta.{method}(max_workers={workers})',
+            lambda method=method, rows_key=rows_key: count_rows(getattr(portal, method)(max_workers=workers),
+                                                                rows_key), counts_rows=True)
+    add(f'PortalNauta.get_connection_details(max_workers={workers}, typed=True)',
+        lambda: count_rows(portal.get_connection_details(max_workers=workers, typed=True), 'all_sessions'),
+        counts_rows=True)
+    add('PortalNauta.iter_connection_sessions', lambda: sum(1 for _ in portal.iter_connection_sessions()),
+        counts_rows=True)
+
+    store = HistoryStore()
+    portal.sync_connection_details(store, max_workers=workers)
+    add(f'PortalNauta.sync_connection_details (warm, max_workers={workers})',
+        lambda: count_rows(portal.sync_connection_details(store, max_workers=workers), 'all_sessions'),
+        counts_rows=True)
+
+    history = portal.get_connection_details(max_workers=workers)
+    add('export.to_columns', lambda: len(export.to_columns(history)['cost']), counts_rows=True)
+    if export.numpy is not None:
+        add('export.to_numpy', lambda: len(export.to_numpy(history)), counts_rows=True)
+    if export.pyarrow is not None:
+        add('export.to_arrow', lambda: export.to_arrow(history).num_rows, counts_rows=True)
+
+    if export.numpy is not None:
+        # Ingest (stored string rows to columns) plus aggregation is what a call on fetched history costs, the
+        # aggregation alone is measured apart on an already converted record array.
+        fleet_history = {f'user{index}@nauta.com.cu': history for index in range(accounts)}
+        fleet_sessions = export.to_numpy(fleet_history, fleet=True)
+
+        def fleet_usage(sessions: Any) -> int:
+            analytics.get_usage(sessions, 'day', by_account=True)
+            return len(fleet_sessions)
+
+        add(f'analytics.get_usage ingest + aggregation ({accounts} accounts)', lambda: fleet_usage(fleet_history),
+            counts_rows=True)
+        add(f'analytics.get_usage aggregation only ({accounts} accounts)', lambda: fleet_usage(fleet_sessions),
+            counts_rows=True)
+
+    # Asyncio clients.
+    if AsyncNautaSession is not None:
+        async def async_login_logout() -> None:
+            async with AsyncNautaSession(USERNAME, PASSWORD, base_url=url):
+                pass
+
+        async def async_connection_details() -> int:
+            async with AsyncPortalNauta(USERNAME, PASSWORD, base_url=url) as async_portal:
+                await async_portal.submit_captcha('abcd')
+                return count_rows(await async_portal.get_connection_details(max_workers=workers), 'all_sessions')
+
+        add('AsyncNautaSession.login + logout', lambda: run_async(async_login_logout()))
+        add(f'AsyncPortalNauta.get_connection_details(max_workers={workers})',
+            lambda: run_async(async_connection_details()), counts_rows=True)
+
+    return benchmarks
+
+
+def start_server(months: int, rows_per_month: int, latency: float) -> tuple:
+    # The server runs in its own process so it neither competes for the GIL nor shows up in the memory peaks.
+    process = Popen([executable, path.join(path.dirname(path.abspath(__file__)), 'mock_server.py'),
+                     '--months', str(months), '--rows-per-month', str(rows_per_month), '--latency', str(latency)],
+                    stdout=PIPE, text=True)
+    return process, process.stdout.readline().strip()
+
+
+def print_results(results: list) -> None:
+    width = max(len(result.name) for result in results)
+    print(f'{"benchmark":<{width}}  {"mean ms":>10}  {"median ms":>10}  {"max ms":>10}  {"ops/s":>10}  '
+          f'{"rows/s":>10}  {"peak KiB":>10}')
+    for result in results:
+        rows_per_second = f'{result.rows_per_second:10.0f}' if result.rows_per_second else f'{"-":>10}'
+        print(f'{result.name:<{width}}  {result.mean_ms:10.3f}  {result.median_ms:10.3f}  {result.max_ms:10.3f}  '
+              f'{result.ops_per_second:10.1f}  {rows_per_second}  {result.peak_memory_kib:10.1f}')
+
+
+def compare_results(results: list, baseline_path: str, tolerance: float) -> list:
+    with open(baseline_path, 'r') as file:
+        baseline = {result['name']: result for result in load(file)['results']}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None:
+            continue
+        for (key, label) in (('median_ms', 'median latency'), ('peak_memory_kib', 'peak memory')):
+            if getattr(result, key) > previous[key] * (1 + tolerance):
+                regressions.append(f'{result.name}: {label} went from {previous[key]:.3f} to '
+                                   f'{getattr(result, key):.3f}.')
+    return regressions
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Benchmark stickNAUTA against a local mock of the Nauta portals.')
+    parser.add_argument('--months', type=int, default=12, help='months of history per list type')
+    parser.add_argument('--rows-per-month', type=int, default=300, help='history rows in every month')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the server waits before responding')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark')
+    parser.add_argument('--workers', type=int, default=8, help='max_workers used by the concurrent benchmarks')
+    parser.add_argument('--accounts', type=int, default=16, help='accounts used by the fleet benchmarks')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--url', help='benchmark an already running server instead of starting one')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file from a previous --output run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown ratio for --compare')
+    arguments = parser.parse_args()
+
+    (process, url) = (None, arguments.url)
+    if url is None:
+        (process, url) = start_server(arguments.months, arguments.rows_per_month, arguments.latency)
+    try:
+        benchmarks = [benchmark for benchmark in build_benchmarks(url, arguments.workers, arguments.accounts)
+                      if arguments.filter in benchmark.name]
+        results = [measure(benchmark, arguments.repeat) for benchmark in benchmarks]
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f'{arguments.months} months x {arguments.rows_per_month} rows per list type, '
+          f'{arguments.latency * 1000:.0f} ms latency, {arguments.repeat} runs each.')
+    print_results(results)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            dump({'arguments': vars(arguments), 'results': [asdict(result) for result in results]}, file, indent=2)
+
+    if arguments.compare:
+        regressions = compare_results(results, arguments.compare, arguments.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            exit(1)
+
+
+if __name__ == '__main__':
+    main()
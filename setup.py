@@ -29,6 +29,11 @@ setup(
         'Topic :: Internet :: WWW/HTTP :: Site Management'
     ],
     install_requires=['lxml', 'requests'],
+    extras_require={
+        'async': ['aiohttp'],
+        'numpy': ['numpy'],
+        'arrow': ['pyarrow']
+    },
     package_dir={'': 'src'},
     packages=find_packages(where='src'),
     python_requires='>=3.7',
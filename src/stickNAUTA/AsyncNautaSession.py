@@ -0,0 +1,300 @@
+from __future__ import (annotations)
+
+from json import (load)
+from time import (perf_counter)
+from typing import (Any, Callable, Tuple, Union)
+from urllib.parse import (urlsplit)
+
+try:
+    from aiohttp import (ClientResponse, ClientSession, CookieJar)
+    from yarl import (URL)
+except ImportError:
+    ClientResponse = ClientSession = CookieJar = URL = None
+
+from ._files import (dump_json_atomically)
+from ._parsing import (parse_alert, parse_attribute_uuid, parse_login_page, parse_user_info,
+                       remaining_time_to_seconds, to_user_info)
+from .RequestStats import (Hooks, ParseEvent, RequestEvent)
+from .SessionStore import (NAUTA_NAMESPACE, SessionStore)
+from .TransportPolicy import (TransportPolicy)
+from .records import (UserInfo)
+
+
+class AsyncNautaSession(object):
+    __nauta_homepage_url: str
+    __nauta_login_url: str
+    __nauta_query_url: str
+    __nauta_logout_url: str
+    __logged_in: bool = False
+    __user_information: dict = None
+    __language: str
+    __session: ClientSession = None
+    __cookies: dict = None
+    __hooks: Hooks = None
+    __transport: TransportPolicy
+    __username: str
+    __password: str
+    __wlanuserip: str = None
+    __CSRFHW: str = None
+    __ATTRIBUTE_UUID: str
+
+    def __init__(self, username: str, password: str, lang_english: bool = True,
+                 base_url: str = 'https://secure.etecsa.net:8443/', hooks: Hooks = None,
+                 transport: TransportPolicy = None) -> None:
+        if ClientSession is None:
+            raise ImportError('AsyncNautaSession requires aiohttp. Install it with: pip install stickNAUTA[async]')
+
+        if type(username) is not str:
+            raise TypeError('username must be a str().')
+        elif type(password) is not str:
+            raise TypeError('password must be a str().')
+        elif type(base_url) is not str:
+            raise TypeError('base_url must be a str().')
+        elif hooks is not None and not isinstance(hooks, Hooks):
+            raise TypeError('hooks must be a Hooks().')
+        elif transport is not None and not isinstance(transport, TransportPolicy):
+            raise TypeError('transport must be a TransportPolicy().')
+        elif transport is not None and transport.shared:
+            raise ValueError('A shared TransportPolicy pools requests connections, async clients cannot use it.')
+
+        if not username.endswith(('@nauta.com.cu', '@nauta.co.cu')):
+            raise ValueError('username is not valid. It must end with @nauta.com.cu or @nauta.co.cu.')
+
+        self.__username = username
+        self.__password = password
+
+        self.__language = 'en_US' if lang_english else 'es_ES'
+        self.__hooks = hooks
+        self.__transport = transport if transport is not None else TransportPolicy()
+
+        base_url = base_url.rstrip('/')
+        self.__nauta_homepage_url = f'{base_url}/'
+        self.__nauta_login_url = f'{base_url}/LoginServlet'
+        self.__nauta_query_url = f'{base_url}/EtecsaQueryServlet'
+        self.__nauta_logout_url = f'{base_url}/LogoutServlet'
+
+    async def __aenter__(self) -> AsyncNautaSession:
+        # __aexit__ does not run when entering fails, so the session opened so far is closed here.
+        try:
+            await self.login()
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        try:
+            await self.logout()
+        finally:
+            await self.close()
+
+    def __get_session(self) -> ClientSession:
+        if self.__session is None:
+            self.__session = ClientSession(cookie_jar=CookieJar(unsafe=True),
+                                           trace_configs=[self.__transport.new_trace_config()])
+            if self.__cookies:
+                self.__session.cookie_jar.update_cookies(self.__cookies, URL(self.__nauta_homepage_url))
+                self.__cookies = None
+        return self.__session
+
+    async def __request(self, operation: str, method: str, url: str,
+                        data: dict = None, idempotent: bool = None) -> Tuple[ClientResponse, bytes]:
+        timing = {}
+        try:
+            (response, content) = await self.__transport.request_async(self.__get_session(), method, url, data,
+                                                                       idempotent, timing)
+        except Exception as exception:
+            if self.__hooks is not None:
+                self.__hooks.on_request(RequestEvent(operation, method, urlsplit(url).path, 0, 0, timing['elapsed'],
+                                                     timing['queued'], timing['attempts'], timing['backoff'],
+                                                     exception))
+            raise
+
+        if self.__hooks is not None:
+            self.__hooks.on_request(RequestEvent(operation, method, urlsplit(url).path, response.status, len(content),
+                                                 timing['elapsed'], timing['queued'], timing['attempts'],
+                                                 timing['backoff'], None))
+        return response, content
+
+    def __parse(self, operation: str, parser: Callable, content: Union[bytes, str], *arguments) -> Any:
+        started = perf_counter()
+        result = parser(content, *arguments)
+        if self.__hooks is not None:
+            self.__hooks.on_parse(ParseEvent(operation, parser.__name__, len(content), perf_counter() - started))
+        return result
+
+    async def initialize(self, acquire_user_info: bool = True) -> None:
+        (response, content) = await self.__request('init', 'GET', self.__nauta_homepage_url)
+        if not response.ok:
+            raise RuntimeError(f'Failed to init session with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        (self.__wlanuserip, self.__CSRFHW) = self.__parse('init', parse_login_page, content, response.charset)
+
+        if acquire_user_info:
+            await self.__acquire_user_info()
+
+    async def __acquire_user_info(self) -> None:
+        (response, content) = await self.__request('user_info', 'POST', self.__nauta_query_url, {
+            'username': self.__username,
+            'password': self.__password,
+            'wlanuserip': self.__wlanuserip,
+            'CSRFHW': self.__CSRFHW,
+            'lang': self.__language
+        }, idempotent=True)
+
+        if not response.ok:
+            raise RuntimeError(f'Failed to get user data (credit) with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        text = await response.text()
+        alert = self.__parse('user_info', parse_alert, text)
+        if alert:
+            raise RuntimeError(f'Failed to get user data (probably related to wrong credentials or '
+                               f'insufficient balance in the account. More info: "{alert}"')
+
+        self.__user_information = self.__parse('user_info', parse_user_info, content, response.charset)
+
+    async def close(self) -> None:
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def login(self) -> None:
+        if self.__logged_in:
+            raise RuntimeError('User is already logged in.')
+
+        if self.__wlanuserip is None:
+            await self.initialize(acquire_user_info=False)
+
+        (response, content) = await self.__request('login', 'POST', self.__nauta_login_url, {
+            'username': self.__username,
+            'password': self.__password,
+            'wlanuserip': self.__wlanuserip,
+            'CSRFHW': self.__CSRFHW,
+            'lang': self.__language
+        })
+
+        if not response.ok:
+            raise RuntimeError(f'Login failure with HTTP code: {response.status} and reason: "{response.reason}".')
+
+        text = await response.text()
+        if 'online.do' not in str(response.url):
+            raise RuntimeError(f'Login failure reason: "{self.__parse("login", parse_alert, text)}".')
+
+        self.__ATTRIBUTE_UUID = self.__parse('login', parse_attribute_uuid, text)
+        self.__logged_in = True
+
+    async def logout(self) -> None:
+        if not self.__logged_in:
+            raise RuntimeError('User is not logged in.')
+
+        (response, content) = await self.__request('logout', 'GET', f'{self.__nauta_logout_url}?'
+                                                             f'username={self.__username}&'
+                                                             f'wlanuserip={self.__wlanuserip}&'
+                                                             f'CSRFHW={self.__CSRFHW}&'
+                                                             f'ATTRIBUTE_UUID={self.__ATTRIBUTE_UUID}')
+
+        if not response.ok:
+            raise RuntimeError(f'Logout failure with HTTP code: {response.status} and reason: "{response.reason}".')
+
+        text = await response.text()
+        if "SUCCESS" not in text:
+            raise RuntimeError(f'Logout failure reason: "{text}".')
+
+        self.__logged_in = False
+        self.__ATTRIBUTE_UUID = str()
+
+    async def get_user_info(self, typed: bool = False) -> Union[dict, UserInfo]:
+        if not self.__user_information:
+            if self.__wlanuserip is None:
+                await self.initialize(acquire_user_info=True)
+            else:
+                await self.__acquire_user_info()
+        return to_user_info(self.__user_information) if typed else self.__user_information
+
+    async def get_remaining_time(self, in_seconds: bool = False) -> Union[str, int]:
+        (response, content) = await self.__request('remaining_time', 'POST', self.__nauta_query_url, {
+            'op': 'getLeftTime',
+            'username': self.__username,
+            'wlanuserip': self.__wlanuserip,
+            'CSRFHW': self.__CSRFHW,
+            'ATTRIBUTE_UUID': self.__ATTRIBUTE_UUID
+        }, idempotent=True)
+
+        if not response.ok:
+            raise RuntimeError(
+                f'Failed to get user data (remaining_time) with HTTP code: {response.status}, '
+                f'reason: "{response.reason}".')
+
+        remaining_time = await response.text()
+        if in_seconds:
+            remaining_time = remaining_time_to_seconds(remaining_time)
+
+        return remaining_time
+
+    def get_session_data(self) -> dict:
+        if not self.__logged_in:
+            raise RuntimeError('Cannot get session data since user is not logged in.')
+
+        if self.__session is not None:
+            cookies = {cookie.key: cookie.value for cookie in self.__session.cookie_jar}
+        else:
+            cookies = dict(self.__cookies or {})
+
+        session_data = {
+            'username': self.__username,
+            'cookies': cookies,
+            'wlanuserip': self.__wlanuserip,
+            'CSRFHW': self.__CSRFHW,
+            'ATTRIBUTE_UUID': self.__ATTRIBUTE_UUID
+        }
+        return session_data
+
+    def set_session_data(self, session_data: dict) -> None:
+        if self.__logged_in:
+            raise RuntimeError('Cannot set session data since user is logged in.')
+
+        required_keys = ['username', 'cookies', 'wlanuserip', 'CSRFHW', 'ATTRIBUTE_UUID']
+        for key in required_keys:
+            if key not in session_data.keys():
+                raise ValueError(f'session_data kas not required key: \'{key}\'.')
+
+        if not session_data['username'] == self.__username:
+            raise ValueError('Session data is not for this account.')
+
+        if self.__session is not None:
+            self.__session.cookie_jar.clear()
+            self.__session.cookie_jar.update_cookies(session_data['cookies'], URL(self.__nauta_homepage_url))
+        else:
+            self.__cookies = dict(session_data['cookies'])
+        self.__wlanuserip = session_data['wlanuserip']
+        self.__CSRFHW = session_data['CSRFHW']
+        self.__ATTRIBUTE_UUID = session_data['ATTRIBUTE_UUID']
+        self.__logged_in = True
+
+    def save_session_data_to_file(self, file_path: str) -> None:
+        dump_json_atomically(self.get_session_data(), file_path)
+
+    def load_session_data_from_file(self, file_path: str) -> None:
+        with open(file_path, 'r') as file:
+            session_data = load(file)
+            if isinstance(session_data, dict):
+                self.set_session_data(session_data)
+            else:
+                raise ValueError('File does not contain a dict and therefore not a session data.')
+
+    def save_session_data_to_store(self, store: SessionStore, ttl: Union[int, float] = None) -> None:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        store.set_session_data(NAUTA_NAMESPACE, self.__username, self.get_session_data(), ttl)
+
+    def load_session_data_from_store(self, store: SessionStore) -> None:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        session_data = store.get_session_data(NAUTA_NAMESPACE, self.__username)
+        if session_data is None:
+            raise KeyError(f'Store has no session data for "{self.__username}" or it already expired.')
+        self.set_session_data(session_data)
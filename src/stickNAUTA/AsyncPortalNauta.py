@@ -0,0 +1,454 @@
+from __future__ import (annotations)
+
+from asyncio import (Semaphore, gather)
+from json import (load)
+from time import (perf_counter)
+from typing import (Any, AsyncIterator, Callable, Tuple, Union)
+from urllib.parse import (urlsplit)
+
+try:
+    from aiohttp import (ClientResponse, ClientSession, CookieJar)
+    from yarl import (URL)
+except ImportError:
+    ClientResponse = ClientSession = CookieJar = URL = None
+
+from ._files import (dump_json_atomically)
+from ._parsing import (DETAILS_LAYOUTS, details_pages, parse_account_data, parse_csrf, parse_details_rows,
+                       parse_details_summary, parse_portal_error, parse_year_months, to_account_data)
+from .PortalNauta import (PortalError)
+from .RequestStats import (Hooks, ParseEvent, RequestEvent)
+from .SessionStore import (PORTAL_NAMESPACE, SessionStore)
+from .TransportPolicy import (TransportPolicy)
+from .records import (AccountData, ConnectionSession, Recharge, Transfer)
+
+
+class AsyncPortalNauta(object):
+    __portal_nauta_homepage_url: str
+    __portal_nauta_login_url: str
+    __portal_nauta_user_url: str
+    __portal_nauta_captcha: str
+    __language: str
+    __session: ClientSession = None
+    __cookies: dict = None
+    __hooks: Hooks = None
+    __transport: TransportPolicy
+    __username: str
+    __password: str
+    __csrf: str = None
+    __account_data: dict = None
+
+    def __init__(self, username: str, password: str, lang_english: bool = True,
+                 base_url: str = 'https://www.portal.nauta.cu/', hooks: Hooks = None,
+                 transport: TransportPolicy = None) -> None:
+        if ClientSession is None:
+            raise ImportError('AsyncPortalNauta requires aiohttp. Install it with: pip install stickNAUTA[async]')
+
+        if type(username) is not str:
+            raise TypeError('username must be a str().')
+        elif type(password) is not str:
+            raise TypeError('password must be a str().')
+        elif type(base_url) is not str:
+            raise TypeError('base_url must be a str().')
+        elif hooks is not None and not isinstance(hooks, Hooks):
+            raise TypeError('hooks must be a Hooks().')
+        elif transport is not None and not isinstance(transport, TransportPolicy):
+            raise TypeError('transport must be a TransportPolicy().')
+        elif transport is not None and transport.shared:
+            raise ValueError('A shared TransportPolicy pools requests connections, async clients cannot use it.')
+
+        if not username.endswith(('@nauta.com.cu', '@nauta.co.cu')):
+            raise ValueError('username is not valid. It must end with @nauta.com.cu or @nauta.co.cu.')
+
+        self.__username = username
+        self.__password = password
+
+        self.__language = 'en-en' if lang_english else 'es-es'
+        self.__hooks = hooks
+        self.__transport = transport if transport is not None else TransportPolicy()
+
+        base_url = base_url.rstrip('/')
+        self.__portal_nauta_homepage_url = f'{base_url}/'
+        self.__portal_nauta_login_url = f'{base_url}/user/login'
+        self.__portal_nauta_user_url = f'{base_url}/useraaa'
+        self.__portal_nauta_captcha = f'{base_url}/captcha'
+
+    async def __aenter__(self) -> AsyncPortalNauta:
+        # __aexit__ does not run when entering fails, so the session opened so far is closed here.
+        try:
+            await self.__get_csrf()
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    def __get_session(self) -> ClientSession:
+        if self.__session is None:
+            self.__session = ClientSession(cookie_jar=CookieJar(unsafe=True),
+                                           headers={'User-Agent': 'python-requests'},
+                                           trace_configs=[self.__transport.new_trace_config()])
+            if self.__cookies:
+                self.__session.cookie_jar.update_cookies(self.__cookies, URL(self.__portal_nauta_homepage_url))
+                self.__cookies = None
+        return self.__session
+
+    async def __request(self, operation: str, method: str, url: str,
+                        data: dict = None, idempotent: bool = None) -> Tuple[ClientResponse, bytes]:
+        timing = {}
+        try:
+            (response, content) = await self.__transport.request_async(self.__get_session(), method, url, data,
+                                                                       idempotent, timing)
+        except Exception as exception:
+            if self.__hooks is not None:
+                self.__hooks.on_request(RequestEvent(operation, method, urlsplit(url).path, 0, 0, timing['elapsed'],
+                                                     timing['queued'], timing['attempts'], timing['backoff'],
+                                                     exception))
+            raise
+
+        if self.__hooks is not None:
+            self.__hooks.on_request(RequestEvent(operation, method, urlsplit(url).path, response.status, len(content),
+                                                 timing['elapsed'], timing['queued'], timing['attempts'],
+                                                 timing['backoff'], None))
+        return response, content
+
+    def __parse(self, operation: str, parser: Callable, content: Union[bytes, str], *arguments) -> Any:
+        started = perf_counter()
+        result = parser(content, *arguments)
+        if self.__hooks is not None:
+            self.__hooks.on_parse(ParseEvent(operation, parser.__name__, len(content), perf_counter() - started))
+        return result
+
+    async def initialize(self) -> None:
+        (response, content) = await self.__request('init', 'GET', f'{self.__portal_nauta_login_url}/{self.__language}')
+        if not response.ok:
+            raise RuntimeError(f'Failed to init session with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        self.__csrf = self.__parse('init', parse_csrf, content, response.charset)
+
+    async def __get_csrf(self) -> str:
+        if self.__csrf is None:
+            await self.initialize()
+        return self.__csrf
+
+    async def close(self) -> None:
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def get_captcha_image(self) -> bytes:
+        await self.__get_csrf()
+
+        (response, content) = await self.__request('captcha', 'GET', self.__portal_nauta_captcha)
+        if not response.ok:
+            raise RuntimeError(f'Failed to get captcha with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+        return content
+
+    async def submit_captcha(self, captcha: str) -> None:
+        if not type(captcha) is str:
+            raise TypeError('captcha must be a str().')
+
+        (response, content) = await self.__request('submit_captcha', 'POST', self.__portal_nauta_login_url, {
+            'csrf': await self.__get_csrf(),
+            'login_user': self.__username,
+            'password_user': self.__password,
+            'captcha': captcha,
+            'btn_submit': ''
+        })
+        if not response.ok:
+            raise RuntimeError(f'Failed to submit CAPTCHA with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        if str(response.url) == self.__portal_nauta_login_url:
+            error = self.__parse('submit_captcha', parse_portal_error, await response.text())
+            if error:
+                # A rejected CAPTCHA comes back with a new login form, the next attempt needs its token.
+                self.__csrf = self.__parse('submit_captcha', parse_csrf, content, response.charset)
+                raise PortalError(f'Failed to submit CAPTCHA code with error: "{error[0]}", description: {error[1]}.',
+                                  *error)
+
+        self.__account_data = {}
+
+    async def recharge_account(self, recharge_code: str) -> None:
+        if self.__account_data is None:
+            raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+
+        if not type(recharge_code) is str:
+            raise TypeError('recharge_dode must be a str().')
+        elif not recharge_code.isdigit():
+            raise ValueError('recharge_code chars must be all digits.')
+        elif not 12 <= len(recharge_code) <= 16:
+            raise ValueError('recharge_code must be between 12 and 16 digits long.')
+
+        (response, content) = await self.__request('recharge', 'POST', self.__portal_nauta_login_url, {
+            'csrf': await self.__get_csrf(),
+            'recharge_code': recharge_code,
+            'btn_submit': ''
+        })
+        if not response.ok:
+            raise RuntimeError(f'Failed to post recharge code with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        error = self.__parse('recharge', parse_portal_error, await response.text())
+        if error:
+            raise PortalError(f'Failed to post recharge code with error: "{error[0]}", description: {error[1]}.',
+                              *error)
+
+    async def change_account_password(self, new_password: str) -> None:
+        if self.__account_data is None:
+            raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+
+        if not type(new_password) is str:
+            raise TypeError('new_password must be a str().')
+
+        (response, content) = await self.__request('change_password', 'POST',
+                                                   f'{self.__portal_nauta_user_url}/change_password', {
+            'csrf': await self.__get_csrf(),
+            'old_password': self.__password,
+            'new_password': new_password,
+            'repeat_new_password': new_password,
+            'btn_submit': ''
+        })
+        if not response.ok:
+            raise RuntimeError(f'Failed to change password code with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        error = self.__parse('change_password', parse_portal_error, await response.text())
+        if error:
+            raise PortalError(f'Failed to change password with error: "{error[0]}", description: {error[1]}.',
+                              *error)
+
+    async def change_email_password(self, old_password: str, new_password: str) -> None:
+        if self.__account_data is None:
+            raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+
+        if not type(old_password) is str:
+            raise TypeError('old_password must be a str().')
+        elif not type(new_password) is str:
+            raise TypeError('new_password must be a str().')
+
+        (response, content) = await self.__request('change_email_password', 'POST',
+                                                   f'{self.__portal_nauta_homepage_url}/email/change_password', {
+            'csrf': await self.__get_csrf(),
+            'old_password': old_password,
+            'new_password': new_password,
+            'repeat_new_password': new_password,
+            'btn_submit': ''
+        })
+        if not response.ok:
+            raise RuntimeError(f'Failed to change password code with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        error = self.__parse('change_email_password', parse_portal_error, await response.text())
+        if error:
+            raise PortalError(f'Failed to change email password with error: "{error[0]}", '
+                              f'description: {error[1]}.', *error)
+
+    async def transfer_balance(self, target_account: str, amount: float) -> None:
+        if self.__account_data is None:
+            raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+
+        if not type(target_account) is str:
+            raise TypeError('target_account must be a str().')
+        elif not type(amount) is float:
+            raise TypeError('amount must be a float().')
+
+        if not target_account.endswith(('@nauta.com.cu', '@nauta.co.cu')):
+            raise ValueError('username is not valid. It must end with @nauta.com.cu or @nauta.co.cu.')
+
+        (response, content) = await self.__request('transfer', 'POST',
+                                                   f'{self.__portal_nauta_user_url}/transfer_balance', {
+            'csrf': await self.__get_csrf(),
+            'transfer': str(amount),
+            'password_user': self.__password,
+            'id_cuenta': target_account,
+            'action': 'checkdata'
+        })
+        if not response.ok:
+            raise RuntimeError(f'Failed to transfer money with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        error = self.__parse('transfer', parse_portal_error, await response.text())
+        if error:
+            raise PortalError(f'Failed to transfer money with error: "{error[0]}", description: {error[1]}.',
+                              *error)
+
+    async def get_account_data(self, refresh: bool = True, typed: bool = False) -> Union[dict, AccountData]:
+        if self.__account_data is None:
+            raise AttributeError('This property is not available until a valid CAPTCHA is submitted!')
+
+        if refresh or not len(self.__account_data.keys()):
+            (response, content) = await self.__request('account_data', 'GET',
+                                                       f'{self.__portal_nauta_user_url}/user_info')
+            if not response.ok:
+                raise RuntimeError(f'Failed to get account info with HTTP code: {response.status}, '
+                                   f'reason: "{response.reason}".')
+
+            self.__account_data = self.__parse('account_data', parse_account_data, content, response.charset)
+
+        return to_account_data(self.__account_data) if typed else self.__account_data
+
+    async def get_connection_details(self, max_workers: int = 1, typed: bool = False) -> dict:
+        return await self.__get_details('service_detail', max_workers, typed)
+
+    async def get_recharge_details(self, max_workers: int = 1, typed: bool = False) -> dict:
+        return await self.__get_details('recharge_detail', max_workers, typed)
+
+    async def get_transfer_details(self, max_workers: int = 1, typed: bool = False) -> dict:
+        return await self.__get_details('transfer_detail', max_workers, typed)
+
+    def iter_connection_sessions(self, typed: bool = False) -> AsyncIterator[Union[dict, ConnectionSession]]:
+        return self.__iter_details('service_detail', typed)
+
+    def iter_recharges(self, typed: bool = False) -> AsyncIterator[Union[dict, Recharge]]:
+        return self.__iter_details('recharge_detail', typed)
+
+    def iter_transfers(self, typed: bool = False) -> AsyncIterator[Union[dict, Transfer]]:
+        return self.__iter_details('transfer_detail', typed)
+
+    async def __get_details(self, list_type: str, max_workers: int, typed: bool) -> dict:
+        if self.__account_data is None:
+            raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+
+        if not type(max_workers) is int:
+            raise TypeError('max_workers must be an int().')
+        elif max_workers < 1:
+            raise ValueError('max_workers must be greater than 0.')
+
+        (name, count_key, _, rows_key, _) = DETAILS_LAYOUTS[list_type]
+
+        (response, content) = await self.__request(list_type, 'GET', f'{self.__portal_nauta_user_url}/{list_type}')
+        if not response.ok:
+            raise RuntimeError(f'Failed to get {name} timestamp with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        year_months = self.__parse(list_type, parse_year_months, content, response.charset)
+        semaphore = Semaphore(max_workers)
+
+        summaries = await gather(*[self.__get_details_summary(semaphore, list_type, year_month, typed)
+                                   for year_month in year_months])
+        details = dict(zip(year_months, summaries))
+
+        pages = [(year_month, page)
+                 for year_month in year_months
+                 for page in details_pages(details[year_month][count_key])]
+        all_rows = await gather(*[self.__get_details_page(semaphore, list_type, year_month,
+                                                          details[year_month][count_key], page, typed)
+                                  for (year_month, page) in pages])
+        for ((year_month, _), rows) in zip(pages, all_rows):
+            details[year_month][rows_key].extend(rows)
+
+        return details
+
+    def __iter_details(self, list_type: str, typed: bool) -> AsyncIterator[Union[dict, Any]]:
+        if self.__account_data is None:
+            raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+
+        return self.__iter_details_rows(list_type, typed)
+
+    async def __iter_details_rows(self, list_type: str, typed: bool) -> AsyncIterator[Union[dict, Any]]:
+        (name, count_key, _, _, _) = DETAILS_LAYOUTS[list_type]
+        semaphore = Semaphore(1)
+
+        (response, content) = await self.__request(list_type, 'GET', f'{self.__portal_nauta_user_url}/{list_type}')
+        if not response.ok:
+            raise RuntimeError(f'Failed to get {name} timestamp with HTTP code: {response.status}, '
+                               f'reason: "{response.reason}".')
+
+        for year_month in self.__parse(list_type, parse_year_months, content, response.charset):
+            count = (await self.__get_details_summary(semaphore, list_type, year_month, typed))[count_key]
+            for page in details_pages(count):
+                for row in await self.__get_details_page(semaphore, list_type, year_month, count, page, typed):
+                    yield row
+
+    async def __get_details_summary(self, semaphore: Semaphore, list_type: str, year_month: str,
+                                    typed: bool) -> dict:
+        async with semaphore:
+            (response, content) = await self.__request(f'{list_type}_summary', 'POST',
+                                                       f'{self.__portal_nauta_user_url}/{list_type}_summary', {
+                'csrf': await self.__get_csrf(),
+                'year_month': year_month,
+                'list_type': 'service_detail'
+            }, idempotent=True)
+            if not response.ok:
+                raise RuntimeError(f'Failed to get {DETAILS_LAYOUTS[list_type][0]} summary with HTTP code: '
+                                   f'{response.status}, reason: "{response.reason}".')
+
+            return self.__parse(f'{list_type}_summary', parse_details_summary, content, list_type, typed,
+                                response.charset)
+
+    async def __get_details_page(self, semaphore: Semaphore, list_type: str, year_month: str,
+                                 count: Union[str, int], page: int, typed: bool) -> list:
+        async with semaphore:
+            (response, content) = await self.__request(f'{list_type}_list', 'GET',
+                                                       f'{self.__portal_nauta_user_url}/{list_type}_list/'
+                                                       f'{year_month}/{count}/{page}')
+            if not response.ok:
+                raise RuntimeError(f'Failed to get all {DETAILS_LAYOUTS[list_type][0]} with HTTP code: '
+                                   f'{response.status}, reason: "{response.reason}".')
+
+            return self.__parse(f'{list_type}_list', parse_details_rows, content, list_type, typed,
+                                response.charset)
+
+    def get_session_data(self) -> dict:
+        if self.__account_data is None:
+            raise RuntimeError('Cannot get session data since user is not logged in. Submit a valid CAPTCHA first!')
+
+        if self.__session is not None:
+            cookies = {cookie.key: cookie.value for cookie in self.__session.cookie_jar}
+        else:
+            cookies = dict(self.__cookies or {})
+
+        session_data = {
+            'username': self.__username,
+            'cookies': cookies,
+        }
+        return session_data
+
+    def set_session_data(self, session_data: dict) -> None:
+        if self.__account_data is not None:
+            raise RuntimeError('Cannot set session data since user is logged in. Submit a valid CAPTCHA first!')
+
+        required_keys = ['username', 'cookies']
+        for key in required_keys:
+            if key not in session_data.keys():
+                raise ValueError(f'session_data kas not required key: \'{key}\'.')
+
+        if not session_data['username'] == self.__username:
+            raise ValueError('Session data is not for this account.')
+
+        if self.__session is not None:
+            self.__session.cookie_jar.clear()
+            self.__session.cookie_jar.update_cookies(session_data['cookies'], URL(self.__portal_nauta_homepage_url))
+        else:
+            self.__cookies = dict(session_data['cookies'])
+        self.__account_data = {}
+
+    def save_session_data_to_file(self, file_path: str) -> None:
+        dump_json_atomically(self.get_session_data(), file_path)
+
+    def load_session_data_from_file(self, file_path: str) -> None:
+        with open(file_path, 'r') as file:
+            session_data = load(file)
+            if isinstance(session_data, dict):
+                self.set_session_data(session_data)
+            else:
+                raise ValueError('File does not contain a dict and therefore not a session data.')
+
+    def save_session_data_to_store(self, store: SessionStore, ttl: Union[int, float] = None) -> None:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        store.set_session_data(PORTAL_NAMESPACE, self.__username, self.get_session_data(), ttl)
+
+    def load_session_data_from_store(self, store: SessionStore) -> None:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        session_data = store.get_session_data(PORTAL_NAMESPACE, self.__username)
+        if session_data is None:
+            raise KeyError(f'Store has no session data for "{self.__username}" or it already expired.')
+        self.set_session_data(session_data)
@@ -0,0 +1,129 @@
+from __future__ import (annotations)
+
+from contextlib import (contextmanager)
+from copy import (deepcopy)
+from json import (dumps, load, loads)
+from os.path import (exists)
+from sqlite3 import (Connection, connect)
+from threading import (Lock, RLock)
+from typing import (Iterator)
+
+from ._files import (dump_json_atomically)
+
+
+class HistoryStore(object):
+    __file_path: str = None
+    __details: dict
+    __lock: RLock
+    __batch_depth: int = 0
+    __dirty: bool = False
+
+    def __init__(self, file_path: str = None) -> None:
+        if file_path is not None and type(file_path) is not str:
+            raise TypeError('file_path must be a str().')
+
+        self.__file_path = file_path
+        self.__details = {}
+        self.__lock = RLock()
+
+        if file_path is not None and exists(file_path):
+            with open(file_path, 'r') as file:
+                details = load(file)
+                if isinstance(details, dict):
+                    self.__details = details
+                else:
+                    raise ValueError('File does not contain a dict and therefore not a history store.')
+
+    def __enter__(self) -> HistoryStore:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def get_details(self, username: str, list_type: str) -> dict:
+        with self.__lock:
+            return deepcopy(self.__details.get(username, {}).get(list_type, {}))
+
+    def set_details(self, username: str, list_type: str, details: dict) -> None:
+        with self.__lock:
+            self.__details.setdefault(username, {})[list_type] = deepcopy(details)
+            self.__dirty = True
+            if self.__batch_depth:
+                return
+        self.save()
+
+    @contextmanager
+    def batch(self) -> Iterator[HistoryStore]:
+        # The whole file is written on every save, so a fleet sync saves once at the end instead of once per account.
+        with self.__lock:
+            self.__batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.__lock:
+                self.__batch_depth -= 1
+                flush = not self.__batch_depth and self.__dirty
+            if flush:
+                self.save()
+
+    def save(self) -> None:
+        if self.__file_path is None:
+            return
+
+        with self.__lock:
+            dump_json_atomically(self.__details, self.__file_path)
+            self.__dirty = False
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteHistoryStore(HistoryStore):
+    __connection: Connection
+    __lock: Lock
+
+    def __init__(self, file_path: str = ':memory:', timeout: float = 30.0) -> None:
+        if type(file_path) is not str:
+            raise TypeError('file_path must be a str().')
+
+        super().__init__()
+        self.__lock = Lock()
+        self.__connection = connect(file_path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        if file_path != ':memory:':
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS history ('
+                                  'username TEXT NOT NULL, '
+                                  'list_type TEXT NOT NULL, '
+                                  'year_month TEXT NOT NULL, '
+                                  'details TEXT NOT NULL, '
+                                  'PRIMARY KEY (username, list_type, year_month))')
+
+    def get_details(self, username: str, list_type: str) -> dict:
+        with self.__lock:
+            rows = self.__connection.execute('SELECT year_month, details FROM history WHERE username = ? AND '
+                                             'list_type = ? ORDER BY rowid', (username, list_type)).fetchall()
+        return {year_month: loads(details) for (year_month, details) in rows}
+
+    def set_details(self, username: str, list_type: str, details: dict) -> None:
+        rows = [(username, list_type, year_month, dumps(month)) for (year_month, month) in details.items()]
+
+        # Only the rows of this account are replaced, in one transaction, so concurrent syncs (also from other
+        # processes) never see each other half written.
+        with self.__lock:
+            self.__connection.execute('BEGIN IMMEDIATE')
+            try:
+                self.__connection.execute('DELETE FROM history WHERE username = ? AND list_type = ?',
+                                          (username, list_type))
+                self.__connection.executemany('INSERT INTO history (username, list_type, year_month, details) '
+                                              'VALUES (?, ?, ?, ?)', rows)
+            except BaseException:
+                self.__connection.execute('ROLLBACK')
+                raise
+            self.__connection.execute('COMMIT')
+
+    def save(self) -> None:
+        pass
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
@@ -0,0 +1,180 @@
+from __future__ import (annotations)
+
+from concurrent.futures import (ThreadPoolExecutor)
+from dataclasses import (dataclass, field)
+from json import (load)
+from threading import (Lock)
+from typing import (Any, Callable, Iterable, Union)
+
+from .NautaSession import (NautaSession)
+from .RequestScheduler import (RequestScheduler)
+from .RequestStats import (Hooks)
+from .SessionStore import (NAUTA_NAMESPACE, SessionStore)
+from .TransportPolicy import (TransportPolicy)
+from ._files import (dump_json_atomically)
+
+
+@dataclass
+class FleetReport(object):
+    results: dict = field(default_factory=dict)
+    failures: dict = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+
+class NautaFleet(object):
+    __accounts: dict
+    __sessions: dict
+    __session_kwargs: dict
+    __max_workers: int
+    __own_transport: bool
+    __lock: Lock
+
+    def __init__(self, accounts: dict, max_workers: int = 8, acquire_user_info: bool = False,
+                 lang_english: bool = True, base_url: str = 'https://secure.etecsa.net:8443/',
+                 hooks: Hooks = None, lazy: bool = True, transport: TransportPolicy = None,
+                 scheduler: RequestScheduler = None) -> None:
+        if not isinstance(accounts, dict):
+            raise TypeError('accounts must be a dict() of username: password.')
+        elif not type(max_workers) is int:
+            raise TypeError('max_workers must be an int().')
+        elif max_workers < 1:
+            raise ValueError('max_workers must be greater than 0.')
+
+        for (username, password) in accounts.items():
+            if type(username) is not str:
+                raise TypeError('username must be a str().')
+            elif type(password) is not str:
+                raise TypeError('password must be a str().')
+            elif not username.endswith(('@nauta.com.cu', '@nauta.co.cu')):
+                raise ValueError(f'username "{username}" is not valid. It must end with @nauta.com.cu or '
+                                 f'@nauta.co.cu.')
+
+        # Sessions of a fleet share one connection pool per host unless told otherwise, so accounts reuse the same
+        # keep-alive sockets instead of opening their own.
+        self.__own_transport = transport is None
+        if transport is None:
+            transport = TransportPolicy(pool_maxsize=max(16, max_workers), shared=True)
+
+        self.__accounts = dict(accounts)
+        self.__sessions = {}
+        self.__session_kwargs = {
+            'acquire_user_info': acquire_user_info,
+            'lang_english': lang_english,
+            'base_url': base_url,
+            'hooks': hooks,
+            'lazy': lazy,
+            'transport': transport,
+            'scheduler': scheduler
+        }
+        self.__max_workers = max_workers
+        self.__lock = Lock()
+
+    def __enter__(self) -> NautaFleet:
+        self.login()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.logout()
+
+    @property
+    def usernames(self) -> list:
+        return list(self.__accounts.keys())
+
+    def get_session(self, username: str) -> NautaSession:
+        if username not in self.__accounts:
+            raise KeyError(f'Account "{username}" is not part of this fleet.')
+
+        with self.__lock:
+            session = self.__sessions.get(username)
+        if session is None:
+            session = NautaSession(username, self.__accounts[username], **self.__session_kwargs)
+            with self.__lock:
+                session = self.__sessions.setdefault(username, session)
+        return session
+
+    def run(self, operation: Callable[[NautaSession], Any], usernames: Iterable[str] = None) -> FleetReport:
+        usernames = self.usernames if usernames is None else list(usernames)
+
+        def run_one(username: str) -> Any:
+            return operation(self.get_session(username))
+
+        report = FleetReport()
+        with ThreadPoolExecutor(min(self.__max_workers, max(len(usernames), 1))) as executor:
+            futures = {username: executor.submit(run_one, username) for username in usernames}
+            for (username, future) in futures.items():
+                try:
+                    report.results[username] = future.result()
+                except Exception as exception:
+                    report.failures[username] = exception
+        return report
+
+    def close(self) -> None:
+        # The shared transport built for the fleet is closed with it, one passed in stays open for its other clients.
+        with self.__lock:
+            sessions = list(self.__sessions.values())
+        for session in sessions:
+            session.close()
+        if self.__own_transport:
+            self.__session_kwargs['transport'].close()
+
+    def login(self, usernames: Iterable[str] = None) -> FleetReport:
+        return self.run(NautaSession.login, usernames)
+
+    def logout(self, usernames: Iterable[str] = None) -> FleetReport:
+        return self.run(NautaSession.logout, usernames)
+
+    def get_remaining_time(self, in_seconds: bool = False, usernames: Iterable[str] = None) -> FleetReport:
+        return self.run(lambda session: session.get_remaining_time(in_seconds), usernames)
+
+    def get_user_info(self, usernames: Iterable[str] = None) -> FleetReport:
+        return self.run(NautaSession.get_user_info, usernames)
+
+    def get_session_data(self, usernames: Iterable[str] = None) -> FleetReport:
+        return self.run(NautaSession.get_session_data, usernames)
+
+    def set_session_data(self, sessions_data: dict) -> FleetReport:
+        if not isinstance(sessions_data, dict):
+            raise TypeError('sessions_data must be a dict() of username: session_data.')
+
+        unknown = [username for username in sessions_data.keys() if username not in self.__accounts]
+        if unknown:
+            raise ValueError(f'sessions_data has accounts that are not part of this fleet: {unknown}.')
+
+        return self.run(lambda session: session.set_session_data(sessions_data[session.username]),
+                        sessions_data.keys())
+
+    def save_session_data_to_file(self, file_path: str) -> FleetReport:
+        report = self.get_session_data()
+        dump_json_atomically(report.results, file_path)
+        return report
+
+    def load_session_data_from_file(self, file_path: str) -> FleetReport:
+        with open(file_path, 'r') as file:
+            sessions_data = load(file)
+            if isinstance(sessions_data, dict):
+                return self.set_session_data(sessions_data)
+            else:
+                raise ValueError('File does not contain a dict and therefore not a fleet session data.')
+
+    def save_session_data_to_store(self, store: SessionStore, ttl: Union[int, float] = None) -> FleetReport:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        report = self.get_session_data()
+        store.set_all_session_data(NAUTA_NAMESPACE, report.results, ttl)
+        return report
+
+    def load_session_data_from_store(self, store: SessionStore) -> FleetReport:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        sessions_data = store.get_all_session_data(NAUTA_NAMESPACE, self.usernames)
+        report = self.set_session_data(sessions_data)
+        for username in self.usernames:
+            if username not in sessions_data:
+                report.failures[username] = KeyError(f'Store has no session data for "{username}" or it already '
+                                                     f'expired.')
+        return report
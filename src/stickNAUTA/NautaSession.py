@@ -1,34 +1,57 @@
 from __future__ import (annotations)
 
-from ctypes import (Union)
-from json import (load, dump)
-from re import (search)
+from functools import (partial)
+from json import (load)
+from time import (perf_counter)
+from typing import (Any, Callable, Union)
+from urllib.parse import (urlsplit)
 
-from lxml import (html)
-from requests import (Session)
+from requests import (Response, Session)
 from requests.utils import (dict_from_cookiejar, cookiejar_from_dict)
 
+from ._files import (dump_json_atomically)
+from ._parsing import (parse_alert, parse_attribute_uuid, parse_login_page, parse_user_info,
+                       remaining_time_to_seconds, to_user_info)
+from .RequestScheduler import (INTERACTIVE, RequestScheduler)
+from .RequestStats import (Hooks, ParseEvent, RequestEvent)
+from .SessionStore import (NAUTA_NAMESPACE, SessionStore)
+from .TransportPolicy import (TransportPolicy)
+from .records import (UserInfo)
+
 
 class NautaSession(object):
-    __nauta_homepage_url: str = 'https://secure.etecsa.net:8443/'
-    __nauta_login_url: str = 'https://secure.etecsa.net:8443/LoginServlet'
-    __nauta_query_url: str = 'https://secure.etecsa.net:8443/EtecsaQueryServlet'
-    __nauta_logout_url: str = 'https://secure.etecsa.net:8443/LogoutServlet'
+    __nauta_homepage_url: str
+    __nauta_login_url: str
+    __nauta_query_url: str
+    __nauta_logout_url: str
     __logged_in: bool = False
     __user_information: dict = None
     __language: str
     __session: Session
     __username: str
     __password: str
-    __wlanuserip: str
-    __CSRFHW: str
+    __wlanuserip: str = None
+    __CSRFHW: str = None
     __ATTRIBUTE_UUID: str
+    __hooks: Hooks = None
+    __transport: TransportPolicy
+    __scheduler: RequestScheduler = None
 
-    def __init__(self, username: str, password: str, acquire_user_info: bool = True, lang_english: bool = True) -> None:
+    def __init__(self, username: str, password: str, acquire_user_info: bool = True, lang_english: bool = True,
+                 base_url: str = 'https://secure.etecsa.net:8443/', hooks: Hooks = None, lazy: bool = False,
+                 transport: TransportPolicy = None, scheduler: RequestScheduler = None) -> None:
         if type(username) is not str:
             raise TypeError('username must be a str().')
         elif type(password) is not str:
             raise TypeError('password must be a str().')
+        elif type(base_url) is not str:
+            raise TypeError('base_url must be a str().')
+        elif hooks is not None and not isinstance(hooks, Hooks):
+            raise TypeError('hooks must be a Hooks().')
+        elif transport is not None and not isinstance(transport, TransportPolicy):
+            raise TypeError('transport must be a TransportPolicy().')
+        elif scheduler is not None and not isinstance(scheduler, RequestScheduler):
+            raise TypeError('scheduler must be a RequestScheduler().')
 
         if not username.endswith(('@nauta.com.cu', '@nauta.co.cu')):
             raise ValueError('username is not valid. It must end with @nauta.com.cu or @nauta.co.cu.')
@@ -38,54 +61,19 @@ class NautaSession(object):
 
         self.__language = 'en_US' if lang_english else 'es_ES'
 
-        self.__session = Session()
+        base_url = base_url.rstrip('/')
+        self.__nauta_homepage_url = f'{base_url}/'
+        self.__nauta_login_url = f'{base_url}/LoginServlet'
+        self.__nauta_query_url = f'{base_url}/EtecsaQueryServlet'
+        self.__nauta_logout_url = f'{base_url}/LogoutServlet'
 
-        response = self.__session.get(self.__nauta_homepage_url)
-        if not response.ok:
-            raise RuntimeError(f'Failed to init session with HTTP code: {response.status_code}, '
-                               f'reason: "{response.reason}".')
+        self.__hooks = hooks
+        self.__transport = transport if transport is not None else TransportPolicy()
+        self.__scheduler = scheduler
+        self.__session = self.__transport.mount(Session())
 
-        html_tree = html.fromstring(response.text)
-        self.__wlanuserip = html_tree.xpath('//*[@id="wlanuserip"]')[0].value
-        self.__CSRFHW = html_tree.xpath('//*[@name="CSRFHW"]')[0].value
-
-        if acquire_user_info:
-            response = self.__session.post(self.__nauta_query_url, {
-                'username': self.__username,
-                'password': self.__password,
-                'wlanuserip': self.__wlanuserip,
-                'CSRFHW': self.__CSRFHW,
-                'lang': self.__language
-            })
-
-            if not response.ok:
-                raise RuntimeError(f'Failed to get user data (credit) with HTTP code: {response.status_code}, '
-                                   f'reason: "{response.reason}".')
-
-            alert = search(r'alert\("(?P<_>[^"]*?)"\)', response.text)
-            if alert:
-                raise RuntimeError(f'Failed to get user data (probably related to wrong credentials or '
-                                   f'insufficient balance in the account. More info: "{alert.group(1)}"')
-
-            html_tree = html.fromstring(response.text)
-            account_state = html_tree.xpath('//*[@id="sessioninfo"]/tbody/tr[1]/td[2]/text()')[0][13:-12]
-            credit = html_tree.xpath('//*[@id="sessioninfo"]/tbody/tr[2]/td[2]/text()')[0][13:-13]
-            expiration_date = html_tree.xpath('//*[@id="sessioninfo"]/tbody/tr[3]/td[2]/text()')[0][13:-12]
-            access_areas = html_tree.xpath('//*[@id="sessioninfo"]/tbody/tr[4]/td[2]/text()')[0][13:-12]
-            sessions_data = html_tree.xpath('//*[@id="sesiontraza"]/tbody/tr/td/text()')
-
-            self.__user_information = {
-                'account_state': account_state,
-                'credit': credit,
-                'expiration_date': expiration_date,
-                'access_areas': access_areas,
-                'sessions': [{
-                    'start': sessions_data[i],
-                    'end': sessions_data[i + 1],
-                    'duration': sessions_data[i + 2]
-                } for i in range(int(len(sessions_data) / 3))
-                ]
-            }
+        if not lazy:
+            self.initialize(acquire_user_info)
 
     def __enter__(self) -> NautaSession:
         self.login()
@@ -94,11 +82,84 @@ class NautaSession(object):
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
         self.logout()
 
+    @property
+    def username(self) -> str:
+        return self.__username
+
+    @property
+    def logged_in(self) -> bool:
+        return self.__logged_in
+
+    def __request(self, operation: str, method: str, url: str, data: dict = None,
+                  idempotent: bool = None) -> Response:
+        before_send = None
+        if self.__scheduler is not None:
+            before_send = partial(self.__scheduler.acquire, urlsplit(url).hostname, self.__username,
+                                  INTERACTIVE)
+
+        timing = {}
+        try:
+            response = self.__transport.request(self.__session, method, url, data, idempotent, before_send, timing)
+        except Exception as exception:
+            if self.__hooks is not None:
+                self.__hooks.on_request(RequestEvent(operation, method, urlsplit(url).path, 0, 0, timing['elapsed'],
+                                                     timing['queued'], timing['attempts'], timing['backoff'],
+                                                     exception))
+            raise
+
+        if self.__hooks is not None:
+            self.__hooks.on_request(RequestEvent(operation, method, urlsplit(url).path, response.status_code,
+                                                 len(response.content), timing['elapsed'], timing['queued'],
+                                                 timing['attempts'], timing['backoff'], None))
+        return response
+
+    def __parse(self, operation: str, parser: Callable, content: Union[bytes, str], *arguments) -> Any:
+        started = perf_counter()
+        result = parser(content, *arguments)
+        if self.__hooks is not None:
+            self.__hooks.on_parse(ParseEvent(operation, parser.__name__, len(content), perf_counter() - started))
+        return result
+
+    def initialize(self, acquire_user_info: bool = True) -> None:
+        response = self.__request('init', 'GET', self.__nauta_homepage_url)
+        if not response.ok:
+            raise RuntimeError(f'Failed to init session with HTTP code: {response.status_code}, '
+                               f'reason: "{response.reason}".')
+
+        (self.__wlanuserip, self.__CSRFHW) = self.__parse('init', parse_login_page, response.content,
+                                                          response.encoding)
+
+        if acquire_user_info:
+            self.__acquire_user_info()
+
+    def __acquire_user_info(self) -> None:
+        response = self.__request('user_info', 'POST', self.__nauta_query_url, {
+            'username': self.__username,
+            'password': self.__password,
+            'wlanuserip': self.__wlanuserip,
+            'CSRFHW': self.__CSRFHW,
+            'lang': self.__language
+        }, idempotent=True)
+
+        if not response.ok:
+            raise RuntimeError(f'Failed to get user data (credit) with HTTP code: {response.status_code}, '
+                               f'reason: "{response.reason}".')
+
+        alert = self.__parse('user_info', parse_alert, response.text)
+        if alert:
+            raise RuntimeError(f'Failed to get user data (probably related to wrong credentials or '
+                               f'insufficient balance in the account. More info: "{alert}"')
+
+        self.__user_information = self.__parse('user_info', parse_user_info, response.content, response.encoding)
+
     def login(self) -> None:
         if self.__logged_in:
             raise RuntimeError('User is already logged in.')
 
-        response = self.__session.post(self.__nauta_login_url, {
+        if self.__wlanuserip is None:
+            self.initialize(acquire_user_info=False)
+
+        response = self.__request('login', 'POST', self.__nauta_login_url, {
             'username': self.__username,
             'password': self.__password,
             'wlanuserip': self.__wlanuserip,
@@ -110,21 +171,20 @@ class NautaSession(object):
             raise RuntimeError(f'Login failure with HTTP code: {response.status_code} and reason: "{response.reason}".')
 
         if 'online.do' not in response.url:
-            reason = search(r'alert\("(?P<_>[^"]*?)"\)', response.text).group(1)
-            raise RuntimeError(f'Login failure reason: "{reason}".')
+            raise RuntimeError(f'Login failure reason: "{self.__parse("login", parse_alert, response.text)}".')
 
-        self.__ATTRIBUTE_UUID = search(r'ATTRIBUTE_UUID=(\w+)&CSRFHW=', response.text).group(1)
+        self.__ATTRIBUTE_UUID = self.__parse('login', parse_attribute_uuid, response.text)
         self.__logged_in = True
 
     def logout(self) -> None:
         if not self.__logged_in:
             raise RuntimeError('User is not logged in.')
 
-        response = self.__session.get(f'{self.__nauta_logout_url}?'
-                                      f'username={self.__username}&'
-                                      f'wlanuserip={self.__wlanuserip}&'
-                                      f'CSRFHW={self.__CSRFHW}&'
-                                      f'ATTRIBUTE_UUID={self.__ATTRIBUTE_UUID}')
+        response = self.__request('logout', 'GET', f'{self.__nauta_logout_url}?'
+                                                   f'username={self.__username}&'
+                                                   f'wlanuserip={self.__wlanuserip}&'
+                                                   f'CSRFHW={self.__CSRFHW}&'
+                                                   f'ATTRIBUTE_UUID={self.__ATTRIBUTE_UUID}')
 
         if not response.ok:
             raise RuntimeError(
@@ -136,20 +196,31 @@ class NautaSession(object):
         self.__logged_in = False
         self.__ATTRIBUTE_UUID = str()
 
-    def get_user_info(self) -> dict:
+    def relogin(self) -> None:
+        # The server already dropped the session, so there is nothing to log out from: the local state is reset and
+        # the login page is scraped again for a fresh wlanuserip and CSRFHW.
+        self.__logged_in = False
+        self.__ATTRIBUTE_UUID = str()
+        self.__session.cookies.clear()
+        self.initialize(acquire_user_info=False)
+        self.login()
+
+    def get_user_info(self, typed: bool = False) -> Union[dict, UserInfo]:
         if not self.__user_information:
-            raise AttributeError('NautaSession has no user information since acquire_user_info=False '
-                                 'was passed to __init__.')
-        return self.__user_information
+            if self.__wlanuserip is None:
+                self.initialize(acquire_user_info=True)
+            else:
+                self.__acquire_user_info()
+        return to_user_info(self.__user_information) if typed else self.__user_information
 
     def get_remaining_time(self, in_seconds: bool = False) -> Union[str, int]:
-        response = self.__session.post(self.__nauta_query_url, {
+        response = self.__request('remaining_time', 'POST', self.__nauta_query_url, {
             'op': 'getLeftTime',
             'username': self.__username,
             'wlanuserip': self.__wlanuserip,
             'CSRFHW': self.__CSRFHW,
             'ATTRIBUTE_UUID': self.__ATTRIBUTE_UUID
-        })
+        }, idempotent=True)
 
         if not response.ok:
             raise RuntimeError(
@@ -158,11 +229,14 @@ class NautaSession(object):
 
         remaining_time = response.text
         if in_seconds:
-            (hours, minutes, seconds) = [int(number) for number in remaining_time.split(':')]
-            remaining_time = hours * 3600 + minutes * 60 + seconds
+            remaining_time = remaining_time_to_seconds(remaining_time)
 
         return remaining_time
 
+    def close(self) -> None:
+        # Releases this client's connections, a shared transport's pool is left to TransportPolicy.close().
+        self.__transport.close_session(self.__session)
+
     def get_session_data(self) -> dict:
         if not self.__logged_in:
             raise RuntimeError('Cannot get session data since user is not logged in.')
@@ -195,8 +269,7 @@ class NautaSession(object):
         self.__logged_in = True
 
     def save_session_data_to_file(self, file_path: str) -> None:
-        with open(file_path, 'w') as file:
-            dump(self.get_session_data(), file)
+        dump_json_atomically(self.get_session_data(), file_path)
 
     def load_session_data_from_file(self, file_path: str) -> None:
         with open(file_path, 'r') as file:
@@ -205,3 +278,18 @@ class NautaSession(object):
                 self.set_session_data(session_data)
             else:
                 raise ValueError('File does not contain a dict and therefore not a session data.')
+
+    def save_session_data_to_store(self, store: SessionStore, ttl: Union[int, float] = None) -> None:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        store.set_session_data(NAUTA_NAMESPACE, self.__username, self.get_session_data(), ttl)
+
+    def load_session_data_from_store(self, store: SessionStore) -> None:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        session_data = store.get_session_data(NAUTA_NAMESPACE, self.__username)
+        if session_data is None:
+            raise KeyError(f'Store has no session data for "{self.__username}" or it already expired.')
+        self.set_session_data(session_data)
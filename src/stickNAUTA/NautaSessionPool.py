@@ -0,0 +1,158 @@
+from __future__ import (annotations)
+
+from concurrent.futures import (ThreadPoolExecutor)
+from threading import (Event, Lock, Thread)
+from time import (monotonic)
+from typing import (Iterable, Union)
+
+from .NautaFleet import (FleetReport)
+from .NautaSession import (NautaSession)
+from .RequestScheduler import (RequestScheduler)
+from .RequestStats import (Hooks)
+from .TransportPolicy import (TransportPolicy)
+
+# Handles are refreshed once they reach this fraction of max_age, so one is never handed out stale while waiting.
+REFRESH_AT: float = 0.75
+
+
+class NautaSessionPool(object):
+    __accounts: dict
+    __session_kwargs: dict
+    __max_age: float
+    __max_workers: int
+    __handles: dict
+    __lock: Lock
+    __stop_event: Event
+    __thread: Thread = None
+
+    def __init__(self, accounts: dict, max_age: Union[int, float] = 120.0, max_workers: int = 4,
+                 lang_english: bool = True, base_url: str = 'https://secure.etecsa.net:8443/', hooks: Hooks = None,
+                 transport: TransportPolicy = None, scheduler: RequestScheduler = None) -> None:
+        if not isinstance(accounts, dict):
+            raise TypeError('accounts must be a dict() of username: password.')
+        elif type(max_age) not in (int, float):
+            raise TypeError('max_age must be an int() or float() of seconds.')
+        elif type(max_workers) is not int:
+            raise TypeError('max_workers must be an int().')
+        elif max_age <= 0:
+            raise ValueError('max_age must be greater than 0.')
+        elif max_workers < 1:
+            raise ValueError('max_workers must be greater than 0.')
+
+        for (username, password) in accounts.items():
+            if type(username) is not str:
+                raise TypeError('username must be a str().')
+            elif type(password) is not str:
+                raise TypeError('password must be a str().')
+            elif not username.endswith(('@nauta.com.cu', '@nauta.co.cu')):
+                raise ValueError(f'username "{username}" is not valid. It must end with @nauta.com.cu or '
+                                 f'@nauta.co.cu.')
+
+        if transport is None:
+            transport = TransportPolicy(pool_maxsize=max(16, max_workers), shared=True)
+
+        self.__accounts = dict(accounts)
+        self.__session_kwargs = {
+            'acquire_user_info': False,
+            'lang_english': lang_english,
+            'base_url': base_url,
+            'hooks': hooks,
+            'lazy': True,
+            'transport': transport,
+            'scheduler': scheduler
+        }
+        self.__max_age = float(max_age)
+        self.__max_workers = max_workers
+        self.__handles = {}
+        self.__lock = Lock()
+        self.__stop_event = Event()
+
+    def __enter__(self) -> NautaSessionPool:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    @property
+    def usernames(self) -> list:
+        return list(self.__accounts.keys())
+
+    @property
+    def max_age(self) -> float:
+        return self.__max_age
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def get_ready(self) -> list:
+        now = monotonic()
+        with self.__lock:
+            return [username for (username, (_, warmed_at)) in self.__handles.items()
+                    if now - warmed_at < self.__max_age]
+
+    def __new_session(self, username: str) -> NautaSession:
+        if username not in self.__accounts:
+            raise KeyError(f'Account "{username}" is not part of this pool.')
+        return NautaSession(username, self.__accounts[username], **self.__session_kwargs)
+
+    def __warm_one(self, username: str) -> None:
+        # The login page scrape (wlanuserip and CSRFHW) is the part of login() that can be done before anyone asks.
+        session = self.__new_session(username)
+        session.initialize(acquire_user_info=False)
+        with self.__lock:
+            self.__handles[username] = (session, monotonic())
+
+    def warm(self, usernames: Iterable[str] = None) -> FleetReport:
+        usernames = self.usernames if usernames is None else list(usernames)
+
+        report = FleetReport()
+        with ThreadPoolExecutor(min(self.__max_workers, max(len(usernames), 1))) as executor:
+            futures = {username: executor.submit(self.__warm_one, username) for username in usernames}
+            for (username, future) in futures.items():
+                try:
+                    report.results[username] = future.result()
+                except Exception as exception:
+                    report.failures[username] = exception
+        return report
+
+    def login(self, username: str) -> NautaSession:
+        with self.__lock:
+            (session, warmed_at) = self.__handles.pop(username, (None, None))
+
+        # A stale or missing handle costs the full login, login() scrapes the page itself when it was never done.
+        if session is None or monotonic() - warmed_at >= self.__max_age:
+            session = self.__new_session(username)
+        session.login()
+        return session
+
+    def start(self) -> FleetReport:
+        if self.running:
+            raise RuntimeError('Pool is already running.')
+
+        report = self.warm()
+        self.__stop_event.clear()
+        self.__thread = Thread(target=self.__run, name='NautaSessionPool', daemon=True)
+        self.__thread.start()
+        return report
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+        with self.__lock:
+            self.__handles.clear()
+
+    def __run(self) -> None:
+        # Accounts whose handle was taken by login() are warmed again here too, ready for their next login.
+        while not self.__stop_event.wait(self.__max_age * (1 - REFRESH_AT)):
+            now = monotonic()
+            with self.__lock:
+                usernames = [username for username in self.__accounts.keys()
+                             if username not in self.__handles
+                             or now - self.__handles[username][1] >= self.__max_age * REFRESH_AT]
+            if usernames:
+                self.warm(usernames)
@@ -0,0 +1,118 @@
+from __future__ import (annotations)
+
+from collections import (OrderedDict)
+from hashlib import (blake2b)
+from pickle import (HIGHEST_PROTOCOL, dumps, loads)
+from sqlite3 import (Connection, connect)
+from threading import (Lock)
+from time import (time)
+from typing import (Optional)
+
+
+class PageCache(object):
+    __max_entries: int
+    __entries: OrderedDict
+    __lock: Lock
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        if type(max_entries) is not int:
+            raise TypeError('max_entries must be an int().')
+        elif max_entries < 1:
+            raise ValueError('max_entries must be greater than 0.')
+
+        self.__max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__lock = Lock()
+
+    def __enter__(self) -> PageCache:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    @property
+    def max_entries(self) -> int:
+        return self.__max_entries
+
+    @staticmethod
+    def get_key(endpoint: str, content: bytes, encoding: str = None, typed: bool = False) -> str:
+        # The declared encoding is part of the page: the same bytes decoded otherwise are a different page. Dict rows
+        # and typed records of one page are different entries.
+        digest = blake2b(content, digest_size=16)
+        digest.update(f'\0{encoding}\0{bool(typed)}'.encode())
+        return f'{endpoint}:{digest.hexdigest()}'
+
+    def get(self, key: str) -> Optional[list]:
+        # Rows are kept pickled, so every hit hands out fresh dicts or records that callers may change. Unpickling
+        # typed records costs a fraction of building them again from the cells.
+        with self.__lock:
+            rows = self.__entries.get(key)
+            if rows is not None:
+                self.__entries.move_to_end(key)
+        return None if rows is None else loads(rows)
+
+    def set(self, key: str, rows: list) -> None:
+        rows = dumps(rows, HIGHEST_PROTOCOL)
+        with self.__lock:
+            self.__entries[key] = rows
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    def close(self) -> None:
+        pass
+
+
+class SQLitePageCache(PageCache):
+    __connection: Connection
+    __lock: Lock
+
+    def __init__(self, file_path: str = ':memory:', max_entries: int = 16384, timeout: float = 30.0) -> None:
+        if type(file_path) is not str:
+            raise TypeError('file_path must be a str().')
+
+        super().__init__(max_entries)
+        self.__lock = Lock()
+        self.__connection = connect(file_path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        if file_path != ':memory:':
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS page_rows ('
+                                  'key TEXT PRIMARY KEY, '
+                                  'rows BLOB NOT NULL, '
+                                  'used_at REAL NOT NULL)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS page_rows_used_at ON page_rows (used_at)')
+
+    def get(self, key: str) -> Optional[list]:
+        with self.__lock:
+            row = self.__connection.execute('SELECT rows FROM page_rows WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.__connection.execute('UPDATE page_rows SET used_at = ? WHERE key = ?', (time(), key))
+        return None if row is None else loads(row[0])
+
+    def set(self, key: str, rows: list) -> None:
+        # Least recently used pages beyond max_entries are evicted in the same transaction as the insert. A key is a
+        # content hash, so replacing an entry rewrites the same rows and INSERT OR REPLACE does without the SQLite 3.24+
+        # ON CONFLICT DO UPDATE.
+        with self.__lock:
+            self.__connection.execute('BEGIN IMMEDIATE')
+            try:
+                self.__connection.execute('INSERT OR REPLACE INTO page_rows (key, rows, used_at) VALUES (?, ?, ?)',
+                                          (key, dumps(rows, HIGHEST_PROTOCOL), time()))
+                self.__connection.execute('DELETE FROM page_rows WHERE key IN (SELECT key FROM page_rows '
+                                          'ORDER BY used_at DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+            except BaseException:
+                self.__connection.execute('ROLLBACK')
+                raise
+            self.__connection.execute('COMMIT')
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__connection.execute('DELETE FROM page_rows')
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
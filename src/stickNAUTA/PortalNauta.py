@@ -1,28 +1,73 @@
-from json import (dump, load)
-from re import (search)
-
-from lxml import (html)
-from requests import (Session)
+from concurrent.futures import (Executor, ThreadPoolExecutor)
+from functools import (partial)
+from json import (load)
+from time import (perf_counter)
+from typing import (Any, Callable, Iterator, Union)
+from urllib.parse import (urlsplit)
+
+from requests import (Response, Session)
 from requests.utils import (dict_from_cookiejar, cookiejar_from_dict)
 
+from .HistoryStore import (HistoryStore)
+from .PageCache import (PageCache)
+from .RequestScheduler import (BACKGROUND, INTERACTIVE, RequestScheduler)
+from .RequestStats import (Hooks, ParseEvent, RequestEvent)
+from .SessionStore import (PORTAL_NAMESPACE, SessionStore)
+from .TTLCache import (TTLCache)
+from .TransportPolicy import (TransportPolicy)
+from ._files import (dump_json_atomically)
+from ._parsing import (DETAILS_LAYOUTS, DETAILS_PAGE_SIZE, build_details_rows, details_pages, parse_account_data,
+                       parse_csrf, parse_details_cells, parse_details_page, parse_details_summary, parse_portal_error,
+                       parse_year_months, to_account_data)
+from .records import (AccountData, ConnectionSession, Recharge, Transfer)
+
+
+class PortalError(RuntimeError):
+    error: str
+    description: str
+
+    def __init__(self, message: str, error: str, description: str) -> None:
+        super().__init__(message)
+        self.error = error
+        self.description = description
+
 
 class PortalNauta(object):
-    __portal_nauta_homepage_url: str = 'https://www.portal.nauta.cu/'
-    __portal_nauta_login_url: str = 'https://www.portal.nauta.cu/user/login'
-    __portal_nauta_user_url: str = 'https://www.portal.nauta.cu/useraaa'
-    __portal_nauta_captcha: str = 'https://www.portal.nauta.cu/captcha'
+    __portal_nauta_homepage_url: str
+    __portal_nauta_login_url: str
+    __portal_nauta_user_url: str
+    __portal_nauta_captcha: str
     __language: str
     __session: Session
     __username: str
     __password: str
     __csrf: str
     __account_data: dict = None
-
-    def __init__(self, username: str, password: str, lang_english: bool = True):
+    __captcha_image: bytes = None
+    __hooks: Hooks = None
+    __transport: TransportPolicy
+    __scheduler: RequestScheduler = None
+    __cache: TTLCache
+    __page_cache: PageCache = None
+
+    def __init__(self, username: str, password: str, lang_english: bool = True,
+                 base_url: str = 'https://www.portal.nauta.cu/', hooks: Hooks = None,
+                 transport: TransportPolicy = None, prefetch_captcha: bool = False, cache_ttls: dict = None,
+                 scheduler: RequestScheduler = None, page_cache: PageCache = None):
         if type(username) is not str:
             raise TypeError('username must be a str().')
         elif type(password) is not str:
             raise TypeError('password must be a str().')
+        elif type(base_url) is not str:
+            raise TypeError('base_url must be a str().')
+        elif hooks is not None and not isinstance(hooks, Hooks):
+            raise TypeError('hooks must be a Hooks().')
+        elif transport is not None and not isinstance(transport, TransportPolicy):
+            raise TypeError('transport must be a TransportPolicy().')
+        elif scheduler is not None and not isinstance(scheduler, RequestScheduler):
+            raise TypeError('scheduler must be a RequestScheduler().')
+        elif page_cache is not None and not isinstance(page_cache, PageCache):
+            raise TypeError('page_cache must be a PageCache().')
 
         if not username.endswith(('@nauta.com.cu', '@nauta.co.cu')):
             raise ValueError('username is not valid. It must end with @nauta.com.cu or @nauta.co.cu.')
@@ -32,19 +77,93 @@ class PortalNauta(object):
 
         self.__language = 'en-en' if lang_english else 'es-es'
 
-        self.__session = Session()
+        base_url = base_url.rstrip('/')
+        self.__portal_nauta_homepage_url = f'{base_url}/'
+        self.__portal_nauta_login_url = f'{base_url}/user/login'
+        self.__portal_nauta_user_url = f'{base_url}/useraaa'
+        self.__portal_nauta_captcha = f'{base_url}/captcha'
+
+        self.__hooks = hooks
+        self.__transport = transport if transport is not None else TransportPolicy()
+        self.__scheduler = scheduler
+        self.__session = self.__transport.mount(Session())
         self.__session.headers['User-Agent'] = 'python-requests'
+        self.__cache = TTLCache(cache_ttls)
+        self.__page_cache = page_cache
 
-        response = self.__session.get(f'{self.__portal_nauta_login_url}/{self.__language}')
+        response = self.__request('init', 'GET', f'{self.__portal_nauta_login_url}/{self.__language}')
         if not response.ok:
             raise RuntimeError(f'Failed to init session with HTTP code: {response.status_code}, '
                                f'reason: "{response.reason}".')
 
-        html_tree = html.fromstring(response.text)
-        self.__csrf = html_tree.xpath('//*[@name="csrf"]')[0].value
+        self.__csrf = self.__parse('init', parse_csrf, response.content, response.encoding)
+
+        # The CAPTCHA is bound to the session cookie of the login page, so it is fetched right after it and is ready
+        # for the solver before anyone asks for it.
+        if prefetch_captcha:
+            self.__captcha_image = self.__fetch_captcha_image()
+
+    @property
+    def username(self) -> str:
+        return self.__username
+
+    @property
+    def logged_in(self) -> bool:
+        return self.__account_data is not None
+
+    def __request(self, operation: str, method: str, url: str, data: dict = None, idempotent: bool = None,
+                  priority: int = INTERACTIVE) -> Response:
+        before_send = None
+        if self.__scheduler is not None:
+            before_send = partial(self.__scheduler.acquire, urlsplit(url).hostname, self.__username, priority)
+
+        timing = {}
+        try:
+            response = self.__transport.request(self.__session, method, url, data, idempotent, before_send, timing)
+        except Exception as exception:
+            if self.__hooks is not None:
+                self.__hooks.on_request(RequestEvent(operation, method, urlsplit(url).path, 0, 0, timing['elapsed'],
+                                                     timing['queued'], timing['attempts'], timing['backoff'],
+                                                     exception))
+            raise
+
+        if self.__hooks is not None:
+            self.__hooks.on_request(RequestEvent(operation, method, urlsplit(url).path, response.status_code,
+                                                 len(response.content), timing['elapsed'], timing['queued'],
+                                                 timing['attempts'], timing['backoff'], None))
+        return response
+
+    def __parse(self, operation: str, parser: Callable, content: Union[bytes, str], *arguments) -> Any:
+        started = perf_counter()
+        result = parser(content, *arguments)
+        if self.__hooks is not None:
+            self.__hooks.on_parse(ParseEvent(operation, parser.__name__, len(content), perf_counter() - started))
+        return result
+
+    def invalidate_cache(self, resource: str = None, list_type: str = None) -> None:
+        if list_type is None:
+            self.__cache.invalidate(resource)
+        elif resource is None:
+            # Only the resources keyed by list type, account data has none and is kept.
+            self.__cache.invalidate('year_months', list_type)
+            self.__cache.invalidate('summary', list_type)
+        else:
+            self.__cache.invalidate(resource, list_type)
+
+    def __invalidate_cache_after_write(self, list_type: str = None) -> None:
+        # Dropped as soon as the write is posted, even if the portal rejects it: an error page does not prove that
+        # nothing changed.
+        self.__cache.invalidate('account_data')
+        if list_type is not None:
+            self.__cache.invalidate('year_months', list_type)
+            self.__cache.invalidate('summary', list_type)
 
     def get_captcha_image(self) -> bytes:
-        response = self.__session.get(self.__portal_nauta_captcha)
+        (captcha_image, self.__captcha_image) = (self.__captcha_image, None)
+        return captcha_image if captcha_image is not None else self.__fetch_captcha_image()
+
+    def __fetch_captcha_image(self) -> bytes:
+        response = self.__request('captcha', 'GET', self.__portal_nauta_captcha)
         if not response.ok:
             raise RuntimeError(f'Failed to get captcha with HTTP code: {response.status_code}, '
                                f'reason: "{response.reason}".')
@@ -54,7 +173,7 @@ class PortalNauta(object):
         if not type(captcha) is str:
             raise TypeError('captcha must be a str().')
 
-        response = self.__session.post(self.__portal_nauta_login_url, {
+        response = self.__request('submit_captcha', 'POST', self.__portal_nauta_login_url, {
             'csrf': self.__csrf,
             'login_user': self.__username,
             'password_user': self.__password,
@@ -66,21 +185,18 @@ class PortalNauta(object):
                                f'reason: "{response.reason}".')
 
         if response.url == self.__portal_nauta_login_url:
-            main_error = search(r"toastr.error\('<ul><li class=\"msg_error\">(.*)<ul>", response.text)
-            if main_error:
-                derived_errors = search(r"<li class=\"sub-message\">(.*)</li></ul></li></ul>'", response.text) \
-                    .group(1).split('</li><li class="sub-message">')
-                error_description = f'"{derived_errors[0]}"'
-                for error in derived_errors[1:]:
-                    error_description += f', "{error}"'
-
-                raise RuntimeError(f'Failed to submit CAPTCHA code with error: "{main_error.group(1)}", '
-                                   f'description: {error_description}.')
+            error = self.__parse('submit_captcha', parse_portal_error, response.text)
+            if error:
+                # A rejected CAPTCHA comes back with a new login form, the next attempt needs its token.
+                self.__csrf = self.__parse('submit_captcha', parse_csrf, response.content, response.encoding)
+                raise PortalError(f'Failed to submit CAPTCHA code with error: "{error[0]}", description: {error[1]}.',
+                                  *error)
 
         self.__account_data = {}
+        self.__cache.invalidate()
 
     def recharge_account(self, recharge_code: str) -> None:
-        if not self.__account_data:
+        if self.__account_data is None:
             raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
 
         if not type(recharge_code) is str:
@@ -90,57 +206,47 @@ class PortalNauta(object):
         elif not 12 <= len(recharge_code) <= 16:
             raise ValueError('recharge_code must be between 12 and 16 digits long.')
 
-        response = self.__session.post(self.__portal_nauta_login_url, {
+        response = self.__request('recharge', 'POST', self.__portal_nauta_login_url, {
             'csrf': self.__csrf,
             'recharge_code': recharge_code,
             'btn_submit': ''
         })
+        self.__invalidate_cache_after_write('recharge_detail')
         if not response.ok:
             raise RuntimeError(f'Failed to post recharge code with HTTP code: {response.status_code}, '
                                f'reason: "{response.reason}".')
 
-        main_error = search(r"toastr.error\('<ul><li class=\"msg_error\">(.*)<ul>", response.text)
-        if main_error:
-            derived_errors = search(r"<li class=\"sub-message\">(.*)</li></ul></li></ul>'", response.text) \
-                .group(1).split('</li><li class="sub-message">')
-            error_description = f'"{derived_errors[0]}"'
-            for error in derived_errors[1:]:
-                error_description += f', "{error}"'
-
-            raise RuntimeError(f'Failed to post recharge code with error: "{main_error.group(1)}", '
-                               f'description: {error_description}.')
+        error = self.__parse('recharge', parse_portal_error, response.text)
+        if error:
+            raise PortalError(f'Failed to post recharge code with error: "{error[0]}", description: {error[1]}.',
+                              *error)
 
     def change_account_password(self, new_password: str) -> None:
-        if not self.__account_data:
+        if self.__account_data is None:
             raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
 
         if not type(new_password) is str:
             raise TypeError('new_password must be a str().')
 
-        response = self.__session.post(f'{self.__portal_nauta_user_url}/change_password', {
+        response = self.__request('change_password', 'POST', f'{self.__portal_nauta_user_url}/change_password', {
             'csrf': self.__csrf,
             'old_password': self.__password,
             'new_password': new_password,
             'repeat_new_password': new_password,
             'btn_submit': ''
         })
+        self.__invalidate_cache_after_write()
         if not response.ok:
             raise RuntimeError(f'Failed to change password code with HTTP code: {response.status_code}, '
                                f'reason: "{response.reason}".')
 
-        main_error = search(r"toastr.error\('<ul><li class=\"msg_error\">(.*)<ul>", response.text)
-        if main_error:
-            derived_errors = search(r"<li class=\"sub-message\">(.*)</li></ul></li></ul>'", response.text) \
-                .group(1).split('</li><li class="sub-message">')
-            error_description = f'"{derived_errors[0]}"'
-            for error in derived_errors[1:]:
-                error_description += f', "{error}"'
-
-            raise RuntimeError(f'Failed to post recharge code with error: "{main_error.group(1)}", '
-                               f'description: {error_description}.')
+        error = self.__parse('change_password', parse_portal_error, response.text)
+        if error:
+            raise PortalError(f'Failed to post recharge code with error: "{error[0]}", description: {error[1]}.',
+                              *error)
 
     def change_email_password(self, old_password: str, new_password: str) -> None:
-        if not self.__account_data:
+        if self.__account_data is None:
             raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
 
         if not type(old_password) is str:
@@ -148,30 +254,26 @@ class PortalNauta(object):
         elif not type(new_password) is str:
             raise TypeError('new_password must be a str().')
 
-        response = self.__session.post(f'{self.__portal_nauta_homepage_url}/email/change_password', {
+        response = self.__request('change_email_password', 'POST',
+                                  f'{self.__portal_nauta_homepage_url}/email/change_password', {
             'csrf': self.__csrf,
             'old_password': old_password,
             'new_password': new_password,
             'repeat_new_password': new_password,
             'btn_submit': ''
         })
+        self.__invalidate_cache_after_write()
         if not response.ok:
             raise RuntimeError(f'Failed to change password code with HTTP code: {response.status_code}, '
                                f'reason: "{response.reason}".')
 
-        main_error = search(r"toastr.error\('<ul><li class=\"msg_error\">(.*)<ul>", response.text)
-        if main_error:
-            derived_errors = search(r"<li class=\"sub-message\">(.*)</li></ul></li></ul>'", response.text) \
-                .group(1).split('</li><li class="sub-message">')
-            error_description = f'"{derived_errors[0]}"'
-            for error in derived_errors[1:]:
-                error_description += f', "{error}"'
-
-            raise RuntimeError(f'Failed to post recharge code with error: "{main_error.group(1)}", '
-                               f'description: {error_description}.')
+        error = self.__parse('change_email_password', parse_portal_error, response.text)
+        if error:
+            raise PortalError(f'Failed to post recharge code with error: "{error[0]}", description: {error[1]}.',
+                              *error)
 
     def transfer_balance(self, target_account: str, amount: float):
-        if not self.__account_data:
+        if self.__account_data is None:
             raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
 
         if not type(target_account) is str:
@@ -182,203 +284,280 @@ class PortalNauta(object):
         if not target_account.endswith(('@nauta.com.cu', '@nauta.co.cu')):
             raise ValueError('username is not valid. It must end with @nauta.com.cu or @nauta.co.cu.')
 
-        response = self.__session.post(f'{self.__portal_nauta_user_url}/transfer_balance', {
+        response = self.__request('transfer', 'POST', f'{self.__portal_nauta_user_url}/transfer_balance', {
             'csrf': self.__csrf,
             'transfer': amount,
             'password_user': self.__password,
             'id_cuenta': target_account,
             'action': 'checkdata'
         })
+        self.__invalidate_cache_after_write('transfer_detail')
         if not response.ok:
             raise RuntimeError(f'Failed to transfer money with HTTP code: {response.status_code}, '
                                f'reason: "{response.reason}".')
 
-        main_error = search(r"toastr.error\('<ul><li class=\"msg_error\">(.*)<ul>", response.text)
-        if main_error:
-            derived_errors = search(r"<li class=\"sub-message\">(.*)</li></ul></li></ul>'", response.text) \
-                .group(1).split('</li><li class="sub-message">')
-            error_description = f'"{derived_errors[0]}"'
-            for error in derived_errors[1:]:
-                error_description += f', "{error}"'
-
-            raise RuntimeError(f'Failed to post recharge code with error: "{main_error.group(1)}", '
-                               f'description: {error_description}.')
+        error = self.__parse('transfer', parse_portal_error, response.text)
+        if error:
+            raise PortalError(f'Failed to post recharge code with error: "{error[0]}", description: {error[1]}.',
+                              *error)
 
-    def get_account_data(self, refresh: bool = True) -> dict:
-        if not self.__account_data:
+    def get_account_data(self, refresh: bool = True, typed: bool = False) -> Union[dict, AccountData]:
+        if self.__account_data is None:
             raise AttributeError('This property is not available until a valid CAPTCHA is submitted!')
 
-        if refresh or not len(self.__account_data.keys()):
-            response = self.__session.get(f'{self.__portal_nauta_user_url}/user_info')
+        # refresh always goes to the portal (balance checks rely on it). Without it the stored copy is returned, and
+        # with an account_data TTL only until that copy expires.
+        expired = 'account_data' in self.__cache.ttls and self.__cache.get('account_data') is None
+        if refresh or expired or not len(self.__account_data.keys()):
+            response = self.__request('account_data', 'GET', f'{self.__portal_nauta_user_url}/user_info')
             if not response.ok:
                 raise RuntimeError(f'Failed to get account info with HTTP code: {response.status_code}, '
                                    f'reason: "{response.reason}".')
 
-            html_tree = html.fromstring(response.text)
-            self.__account_data = {
-                'username': html_tree.xpath('//*[@id="content"]/div[2]/div/div/div/div[2]/div/p/text()')[0],
-                'blocking_date': html_tree.xpath('//*[@id="content"]/div[2]/div/div/div/div[3]/div[1]/p/text()')[0],
-                'elimination_date': html_tree.xpath('//*[@id="content"]/div[2]/div/div/div/div[3]/div[2]/p/text()')[0],
-                'account_type': html_tree.xpath('//*[@id="content"]/div[2]/div/div/div/div[4]/div[1]/p/text()')[0],
-                'service_type': html_tree.xpath('//*[@id="content"]/div[2]/div/div/div/div[4]/div[2]/p/text()')[0],
-                'available_balance': html_tree.xpath('//*[@id="content"]/div[2]/div/div/div/div[5]/div[1]/p/text()')[0],
-                'remaining_time': html_tree.xpath('//*[@id="content"]/div[2]/div/div/div/div[5]/div[2]/p/text()')[0],
-                'email_account': html_tree.xpath('//*[@id="content"]/div[2]/div/div/div/div[6]/div/p/text()')[0]
-            }
-
-        return self.__account_data
-
-    def get_connection_details(self) -> dict:
-        if not self.__account_data:
-            raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+            self.__account_data = self.__parse('account_data', parse_account_data, response.content, response.encoding)
+            self.__cache.set('account_data', self.__account_data)
 
-        connection_details = {}
-        response = self.__session.get(f'{self.__portal_nauta_user_url}/service_detail')
-        if not response.ok:
-            raise RuntimeError(f'Failed to get connection details timestamp with HTTP code: {response.status_code}, '
-                               f'reason: "{response.reason}".')
+        return to_account_data(self.__account_data) if typed else self.__account_data
 
-        for timestamp in html.fromstring(response.text).xpath('//*[@name="year_month"]/option'):
-            year_month = timestamp.attrib['value']
-            connection_details[year_month] = {}
+    def get_connection_details(self, max_workers: int = 1, typed: bool = False,
+                               parse_executor: Executor = None) -> dict:
+        return self.__get_details('service_detail', max_workers, typed, parse_executor)
 
-            response = self.__session.post(f'{self.__portal_nauta_user_url}/service_detail_summary', {
-                'csrf': self.__csrf,
-                'year_month': year_month,
-                'list_type': 'service_detail'
-            })
-            if not response.ok:
-                raise RuntimeError(
-                    f'Failed to get connection details summary with HTTP code: {response.status_code}, '
-                    f'reason: "{response.reason}".')
-
-            summary_data = html.fromstring(response.text).xpath('//*[@class="card-stats-number"]/text()')
-            connection_details[year_month]['connections'] = summary_data[0]
-            connection_details[year_month]['total_time'] = summary_data[1]
-            connection_details[year_month]['total_import'] = summary_data[2]
-            connection_details[year_month]['upload_traffic'] = summary_data[3]
-            connection_details[year_month]['download_traffic'] = summary_data[4]
-            connection_details[year_month]['total_traffic'] = summary_data[5]
-            connection_details[year_month]['all_sessions'] = []
-
-            for i in range(1, int(int(connection_details[year_month]['connections']) / 15) + 2):
-                response = self.__session.get(f"{self.__portal_nauta_user_url}/service_detail_list/"
-                                              f"{year_month}/{connection_details[year_month]['connections']}/{i}")
-                if not response.ok:
-                    raise RuntimeError(
-                        f'Failed to get all sessions connection details with HTTP code: {response.status_code}, '
-                        f'reason: "{response.reason}".')
-
-                rows = html.fromstring(response.text).xpath('/html/body/div[1]/div/table/tr/td/text()')
-                for j in range(0, len(rows), 6):
-                    connection_details[year_month]['all_sessions'].append({
-                        'start_datetime': rows[j],
-                        'end_datetime': rows[j + 1],
-                        'duration': rows[j + 2],
-                        'upload_traffic': rows[j + 3],
-                        'download_traffic': rows[j + 4],
-                        'import': rows[j + 5],
-                    })
-
-        return connection_details
-
-    def get_recharge_details(self) -> dict:
-        if not self.__account_data:
-            raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+    def get_recharge_details(self, max_workers: int = 1, typed: bool = False,
+                             parse_executor: Executor = None) -> dict:
+        return self.__get_details('recharge_detail', max_workers, typed, parse_executor)
 
-        recharge_details = {}
-        response = self.__session.get(f'{self.__portal_nauta_user_url}/recharge_detail')
-        if not response.ok:
-            raise RuntimeError(f'Failed to get recharge details timestamp with HTTP code: {response.status_code}, '
-                               f'reason: "{response.reason}".')
+    def get_transfer_details(self, max_workers: int = 1, typed: bool = False,
+                             parse_executor: Executor = None) -> dict:
+        return self.__get_details('transfer_detail', max_workers, typed, parse_executor)
 
-        for timestamp in html.fromstring(response.text).xpath('//*[@name="year_month"]/option'):
-            year_month = timestamp.attrib['value']
-            recharge_details[year_month] = {}
+    def sync_connection_details(self, store: HistoryStore, max_workers: int = 1,
+                                parse_executor: Executor = None) -> dict:
+        return self.__sync_details('service_detail', store, max_workers, parse_executor)
 
-            response = self.__session.post(f'{self.__portal_nauta_user_url}/recharge_detail_summary', {
-                'csrf': self.__csrf,
-                'year_month': year_month,
-                'list_type': 'service_detail'
-            })
-            if not response.ok:
-                raise RuntimeError(
-                    f'Failed to get recharge details summary with HTTP code: {response.status_code}, '
-                    f'reason: "{response.reason}".')
-
-            summary_data = html.fromstring(response.text).xpath('//*[@class="card-stats-number"]/text()')
-            recharge_details[year_month]['recharges'] = summary_data[0]
-            recharge_details[year_month]['total_import'] = summary_data[1]
-            recharge_details[year_month]['all_recharges'] = []
-
-            for i in range(1, int(int(recharge_details[year_month]['recharges']) / 15) + 2):
-                response = self.__session.get(f"{self.__portal_nauta_user_url}/recharge_detail_list/"
-                                              f"{year_month}/{recharge_details[year_month]['recharges']}/{i}")
-                if not response.ok:
-                    raise RuntimeError(
-                        f'Failed to get all recharges details with HTTP code: {response.status_code}, '
-                        f'reason: "{response.reason}".')
-
-                rows = html.fromstring(response.text).xpath('/html/body/div[1]/div/table/tr/td/text()')
-                for j in range(0, len(rows), 4):
-                    recharge_details[year_month]['all_recharges'].append({
-                        'datetime': rows[j],
-                        'import': rows[j + 1],
-                        'channel': rows[j + 2],
-                        'type': rows[j + 3]
-                    })
-
-        return recharge_details
-
-    def get_transfer_details(self) -> dict:
-        if not self.__account_data:
+    def sync_recharge_details(self, store: HistoryStore, max_workers: int = 1,
+                              parse_executor: Executor = None) -> dict:
+        return self.__sync_details('recharge_detail', store, max_workers, parse_executor)
+
+    def sync_transfer_details(self, store: HistoryStore, max_workers: int = 1,
+                              parse_executor: Executor = None) -> dict:
+        return self.__sync_details('transfer_detail', store, max_workers, parse_executor)
+
+    def iter_connection_sessions(self, typed: bool = False) -> Iterator[Union[dict, ConnectionSession]]:
+        return self.__iter_details('service_detail', typed)
+
+    def iter_recharges(self, typed: bool = False) -> Iterator[Union[dict, Recharge]]:
+        return self.__iter_details('recharge_detail', typed)
+
+    def iter_transfers(self, typed: bool = False) -> Iterator[Union[dict, Transfer]]:
+        return self.__iter_details('transfer_detail', typed)
+
+    def __get_details_year_months(self, list_type: str, max_workers: int) -> list:
+        if self.__account_data is None:
             raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
 
-        transfer_details = {}
-        response = self.__session.get(f'{self.__portal_nauta_user_url}/transfer_detail')
-        if not response.ok:
-            raise RuntimeError(f'Failed to get transfer details timestamp with HTTP code: {response.status_code}, '
-                               f'reason: "{response.reason}".')
+        if not type(max_workers) is int:
+            raise TypeError('max_workers must be an int().')
+        elif max_workers < 1:
+            raise ValueError('max_workers must be greater than 0.')
 
-        for timestamp in html.fromstring(response.text).xpath('//*[@name="year_month"]/option'):
-            year_month = timestamp.attrib['value']
-            transfer_details[year_month] = {}
+        year_months = self.__cache.get('year_months', list_type)
+        if year_months is not None:
+            return list(year_months)
 
-            response = self.__session.post(f'{self.__portal_nauta_user_url}/transfer_detail_summary', {
-                'csrf': self.__csrf,
-                'year_month': year_month,
-                'list_type': 'service_detail'
-            })
-            if not response.ok:
-                raise RuntimeError(
-                    f'Failed to get transfer details summary with HTTP code: {response.status_code}, '
-                    f'reason: "{response.reason}".')
-
-            summary_data = html.fromstring(response.text).xpath('//*[@class="card-stats-number"]/text()')
-            transfer_details[year_month]['transfers'] = summary_data[0]
-            transfer_details[year_month]['total_import'] = summary_data[1]
-            transfer_details[year_month]['all_transfers'] = []
-
-            for i in range(1, int(int(transfer_details[year_month]['transfers']) / 15) + 2):
-                response = self.__session.get(f"{self.__portal_nauta_user_url}/transfer_detail_list/"
-                                              f"{year_month}/{transfer_details[year_month]['transfers']}/{i}")
-                if not response.ok:
-                    raise RuntimeError(
-                        f'Failed to get all transfer details with HTTP code: {response.status_code}, '
-                        f'reason: "{response.reason}".')
-
-                rows = html.fromstring(response.text).xpath('/html/body/div[1]/div/table/tr/td/text()')
-                for j in range(0, len(rows), 3):
-                    transfer_details[year_month]['all_transfers'].append({
-                        'datetime': rows[j],
-                        'import': rows[j + 1],
-                        'target_account': rows[j + 2]
-                    })
-
-        return transfer_details
+        response = self.__request(list_type, 'GET', f'{self.__portal_nauta_user_url}/{list_type}',
+                                  priority=BACKGROUND)
+        if not response.ok:
+            raise RuntimeError(f'Failed to get {DETAILS_LAYOUTS[list_type][0]} timestamp with HTTP code: '
+                               f'{response.status_code}, reason: "{response.reason}".')
+
+        year_months = self.__parse(list_type, parse_year_months, response.content, response.encoding)
+        self.__cache.set('year_months', tuple(year_months), list_type)
+        return year_months
+
+    def __get_details(self, list_type: str, max_workers: int, typed: bool, parse_executor: Executor) -> dict:
+        (_, count_key, _, rows_key, _) = DETAILS_LAYOUTS[list_type]
+        self.__check_parse_executor(parse_executor)
+        year_months = self.__get_details_year_months(list_type, max_workers)
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            summaries = self.__map_in_order(executor, self.__get_details_summary,
+                                            [(list_type, year_month, typed) for year_month in year_months])
+            details = dict(zip(year_months, summaries))
+
+            pages = [(list_type, year_month, details[year_month][count_key], page, typed, parse_executor)
+                     for year_month in year_months
+                     for page in details_pages(details[year_month][count_key])]
+            rows_by_page = self.__map_in_order(executor, self.__get_details_page, pages)
+            for ((_, year_month, *_), rows) in zip(pages, rows_by_page):
+                details[year_month][rows_key].extend(rows)
+
+        return details
+
+    def __iter_details(self, list_type: str, typed: bool) -> Iterator[Union[dict, Any]]:
+        if self.__account_data is None:
+            raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+
+        return self.__iter_details_rows(list_type, typed)
+
+    def __iter_details_rows(self, list_type: str, typed: bool) -> Iterator[Union[dict, Any]]:
+        count_key = DETAILS_LAYOUTS[list_type][1]
+
+        for year_month in self.__get_details_year_months(list_type, 1):
+            count = self.__get_details_summary(list_type, year_month, typed)[count_key]
+            for page in details_pages(count):
+                yield from self.__get_details_page(list_type, year_month, count, page, typed, None)
+
+    def __sync_details(self, list_type: str, store: HistoryStore, max_workers: int, parse_executor: Executor) -> dict:
+        if not isinstance(store, HistoryStore):
+            raise TypeError('store must be a HistoryStore().')
+        self.__check_parse_executor(parse_executor)
+
+        rows_key = DETAILS_LAYOUTS[list_type][3]
+        year_months = self.__get_details_year_months(list_type, max_workers)
+        stored_details = store.get_details(self.__username, list_type)
+        current_year_month = max(year_months, default=None)
+
+        summaries = []
+        try:
+            with ThreadPoolExecutor(max_workers) as executor:
+                summaries = self.__map_in_order(executor, self.__get_details_summary,
+                                                [(list_type, year_month, False) for year_month in year_months])
+                for summary in summaries:
+                    summary['partial'] = True
+                self.__map_in_order(executor, self.__sync_details_month,
+                                    [(list_type, year_month, summary, stored_details.get(year_month),
+                                      year_month == current_year_month, parse_executor)
+                                     for (year_month, summary) in zip(year_months, summaries)])
+        except BaseException:
+            # Finished months and the pages already fetched of unfinished ones are stored, so the next sync resumes
+            # from the page that failed instead of starting over.
+            if summaries:
+                partial_details = {year_month: stored_details[year_month] for year_month in year_months
+                                   if year_month in stored_details}
+                partial_details.update({year_month: summary for (year_month, summary) in zip(year_months, summaries)
+                                        if not summary.get('partial') or summary[rows_key]})
+                store.set_details(self.__username, list_type, partial_details)
+            raise
+
+        details = dict(zip(year_months, summaries))
+        store.set_details(self.__username, list_type, details)
+        return details
+
+    def __sync_details_month(self, list_type: str, year_month: str, summary: dict, stored_month: dict,
+                             is_current: bool, parse_executor: Executor) -> dict:
+        (_, count_key, _, rows_key, _) = DETAILS_LAYOUTS[list_type]
+        count = summary[count_key]
+        partial = bool(stored_month) and stored_month.get('partial', False)
+
+        if stored_month and not partial and not is_current and stored_month[count_key] == count:
+            summary[rows_key] = stored_month[rows_key]
+            summary.pop('partial', None)
+            return summary
+
+        # Pages list newest rows first, so new rows are the ones before the first already stored row. If that does
+        # not add up to the summary count the remaining pages are fetched as a plain full sync of the month. A month
+        # left partial by a failed sync keeps its first pages while the count is unchanged and resumes after them.
+        (pages, known_rows) = (details_pages(count), [])
+        if partial and stored_month[count_key] == count:
+            summary[rows_key].extend(stored_month[rows_key])
+            pages = pages[len(stored_month[rows_key]) // DETAILS_PAGE_SIZE:]
+        elif stored_month and not partial:
+            known_rows = stored_month[rows_key]
+
+        for page in pages:
+            rows = self.__get_details_page(list_type, year_month, count, page, False, parse_executor)
+            if known_rows and known_rows[0] in rows:
+                new_rows = rows[:rows.index(known_rows[0])]
+                if len(summary[rows_key]) + len(new_rows) + len(known_rows) == int(count):
+                    summary[rows_key].extend(new_rows + known_rows)
+                    break
+                known_rows = []
+
+            summary[rows_key].extend(rows)
+
+        summary.pop('partial', None)
+        return summary
+
+    def __get_details_summary(self, list_type: str, year_month: str, typed: bool) -> dict:
+        # Callers fill the rows of the summary they get, so the cache hands out copies with an empty rows list.
+        rows_key = DETAILS_LAYOUTS[list_type][3]
+        summary = self.__cache.get('summary', list_type, year_month, typed)
+        if summary is not None:
+            return {**summary, rows_key: []}
+
+        response = self.__request(f'{list_type}_summary', 'POST',
+                                  f'{self.__portal_nauta_user_url}/{list_type}_summary', {
+            'csrf': self.__csrf,
+            'year_month': year_month,
+            'list_type': 'service_detail'
+        }, idempotent=True, priority=BACKGROUND)
+        if not response.ok:
+            raise RuntimeError(f'Failed to get {DETAILS_LAYOUTS[list_type][0]} summary with HTTP code: '
+                               f'{response.status_code}, reason: "{response.reason}".')
+
+        summary = self.__parse(f'{list_type}_summary', parse_details_summary, response.content, list_type, typed,
+                               response.encoding)
+        self.__cache.set('summary', {**summary, rows_key: []}, list_type, year_month, typed)
+        return summary
+
+    def __get_details_page(self, list_type: str, year_month: str, count: Union[str, int], page: int,
+                           typed: bool, parse_executor: Executor) -> list:
+        response = self.__request(f'{list_type}_list', 'GET',
+                                  f'{self.__portal_nauta_user_url}/{list_type}_list/{year_month}/{count}/{page}',
+                                  priority=BACKGROUND)
+        if not response.ok:
+            raise RuntimeError(f'Failed to get all {DETAILS_LAYOUTS[list_type][0]} with HTTP code: '
+                               f'{response.status_code}, reason: "{response.reason}".')
+
+        # Old months never change, so on repeat syncs most pages are byte-identical to one already parsed and their
+        # rows (dicts or typed records) come straight from the cache, neither parsed nor built again.
+        if self.__page_cache is not None:
+            key = self.__page_cache.get_key(f'{list_type}_list', response.content, response.encoding, typed)
+            rows = self.__page_cache.get(key)
+            if rows is not None:
+                return rows
+
+        if parse_executor is None:
+            (cells, rows) = (self.__parse(f'{list_type}_list', parse_details_cells, response.content, list_type,
+                                          response.encoding), None)
+        else:
+            (cells, rows) = self.__parse(f'{list_type}_list', self.__parse_details_page_in, response.content,
+                                         parse_executor, list_type, typed, response.encoding)
+        rows = build_details_rows(cells, list_type, typed) if rows is None else rows
+
+        if self.__page_cache is not None:
+            self.__page_cache.set(key, rows)
+        return rows
+
+    @staticmethod
+    def __check_parse_executor(parse_executor: Executor) -> None:
+        if parse_executor is not None and not isinstance(parse_executor, Executor):
+            raise TypeError('parse_executor must be an Executor() (e.g. a ProcessPoolExecutor()).')
+
+    @staticmethod
+    def __parse_details_page_in(content: bytes, parse_executor: Executor, list_type: str, typed: bool,
+                                encoding: str) -> tuple:
+        # Only the raw page crosses to the worker and only compact cells (or typed records) come back. The fetching
+        # thread waits here meanwhile, so pages are parsed on as many cores as there are pages in flight.
+        return parse_executor.submit(parse_details_page, content, list_type, typed, encoding).result()
+
+    @staticmethod
+    def __map_in_order(executor: Executor, function: Callable, arguments: list) -> list:
+        futures = [executor.submit(function, *argument) for argument in arguments]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def close(self) -> None:
+        # Releases this client's connections, a shared transport's pool is left to TransportPolicy.close().
+        self.__transport.close_session(self.__session)
 
     def get_session_data(self) -> dict:
-        if not self.__account_data:
+        if self.__account_data is None:
             raise RuntimeError('Cannot get session data since user is not logged in. Submit a valid CAPTCHA first!')
 
         session_data = {
@@ -388,7 +567,7 @@ class PortalNauta(object):
         return session_data
 
     def set_session_data(self, session_data: dict) -> None:
-        if self.__account_data:
+        if self.__account_data is not None:
             raise RuntimeError('Cannot set session data since user is logged in. Submit a valid CAPTCHA first!')
 
         required_keys = ['username', 'cookies']
@@ -401,10 +580,10 @@ class PortalNauta(object):
 
         self.__session.cookies = cookiejar_from_dict(session_data['cookies'])
         self.__account_data = {}
+        self.__cache.invalidate()
 
     def save_session_data_to_file(self, file_path: str) -> None:
-        with open(file_path, 'w') as file:
-            dump(self.get_session_data(), file)
+        dump_json_atomically(self.get_session_data(), file_path)
 
     def load_session_data_from_file(self, file_path: str) -> None:
         with open(file_path, 'r') as file:
@@ -413,3 +592,18 @@ class PortalNauta(object):
                 self.set_session_data(session_data)
             else:
                 raise ValueError('File does not contain a dict and therefore not a session data.')
+
+    def save_session_data_to_store(self, store: SessionStore, ttl: Union[int, float] = None) -> None:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        store.set_session_data(PORTAL_NAMESPACE, self.__username, self.get_session_data(), ttl)
+
+    def load_session_data_from_store(self, store: SessionStore) -> None:
+        if not isinstance(store, SessionStore):
+            raise TypeError('store must be a SessionStore().')
+
+        session_data = store.get_session_data(PORTAL_NAMESPACE, self.__username)
+        if session_data is None:
+            raise KeyError(f'Store has no session data for "{self.__username}" or it already expired.')
+        self.set_session_data(session_data)
@@ -0,0 +1,174 @@
+from __future__ import (annotations)
+
+from threading import (RLock, Timer)
+from time import (monotonic)
+from typing import (Callable, Union)
+
+from .NautaSession import (NautaSession)
+from ._parsing import (seconds_to_remaining_time)
+
+# Below this many seconds between two syncs the 1 second resolution of the server value makes rate samples useless.
+MIN_RATE_WINDOW: float = 30.0
+
+
+class RemainingTimeClock(object):
+    __session: NautaSession
+    __resync_interval: float
+    __smoothing: float
+    __remaining: int = None
+    __synced_at: float = None
+    __rate: float = 1.0
+    __drift: float = 0.0
+    __thresholds: dict
+    __timer: Timer = None
+    __lock: RLock
+
+    def __init__(self, session: NautaSession, resync_interval: Union[int, float] = 300.0,
+                 smoothing: float = 0.5) -> None:
+        if not isinstance(session, NautaSession):
+            raise TypeError('session must be a NautaSession().')
+        elif type(resync_interval) not in (int, float):
+            raise TypeError('resync_interval must be an int() or float() of seconds.')
+        elif type(smoothing) is not float:
+            raise TypeError('smoothing must be a float().')
+
+        if resync_interval <= 0:
+            raise ValueError('resync_interval must be greater than 0.')
+        elif not 0 < smoothing <= 1:
+            raise ValueError('smoothing must be greater than 0 and not greater than 1.')
+
+        self.__session = session
+        self.__resync_interval = float(resync_interval)
+        self.__smoothing = smoothing
+        self.__thresholds = {}
+        self.__lock = RLock()
+
+    @property
+    def session(self) -> NautaSession:
+        return self.__session
+
+    @property
+    def resync_interval(self) -> float:
+        return self.__resync_interval
+
+    @property
+    def rate(self) -> float:
+        return self.__rate
+
+    @property
+    def drift(self) -> float:
+        return self.__drift
+
+    @property
+    def last_sync_age(self) -> Union[float, None]:
+        with self.__lock:
+            return None if self.__synced_at is None else monotonic() - self.__synced_at
+
+    def __predict(self, now: float) -> int:
+        return max(0, round(self.__remaining - self.__rate * (now - self.__synced_at)))
+
+    def sync(self) -> int:
+        if not self.__session.logged_in:
+            raise RuntimeError('User is not logged in.')
+
+        remaining = self.__session.get_remaining_time(in_seconds=True)
+        now = monotonic()
+
+        with self.__lock:
+            if self.__synced_at is not None:
+                self.__drift = self.__predict(now) - remaining
+                elapsed = now - self.__synced_at
+                # A higher value than the last sync means the account was recharged, so it says nothing of the rate.
+                if elapsed >= MIN_RATE_WINDOW and remaining <= self.__remaining:
+                    self.__rate += ((self.__remaining - remaining) / elapsed - self.__rate) * self.__smoothing
+
+            (self.__remaining, self.__synced_at) = (remaining, now)
+
+            callbacks = []
+            for (threshold, entry) in self.__thresholds.items():
+                if remaining > threshold:
+                    entry['armed'] = True
+                elif entry['armed']:
+                    entry['armed'] = False
+                    callbacks.append(entry['callback'])
+
+            self.__schedule()
+
+        for callback in callbacks:
+            callback(remaining)
+        return remaining
+
+    def get_remaining_time(self, in_seconds: bool = False) -> Union[str, int]:
+        with self.__lock:
+            stale = self.__synced_at is None or monotonic() - self.__synced_at >= self.__resync_interval
+        if stale:
+            self.sync()
+
+        with self.__lock:
+            remaining = self.__predict(monotonic())
+        return remaining if in_seconds else seconds_to_remaining_time(remaining)
+
+    def add_threshold(self, seconds: int, callback: Callable[[int], None]) -> None:
+        if type(seconds) is not int:
+            raise TypeError('seconds must be an int().')
+        elif not callable(callback):
+            raise TypeError('callback must be callable.')
+        elif seconds < 0:
+            raise ValueError('seconds must not be negative.')
+
+        with self.__lock:
+            self.__thresholds[seconds] = {'callback': callback, 'armed': True}
+            synced = self.__synced_at is not None
+            if synced:
+                self.__schedule()
+
+        # Once synced, a threshold that is already crossed gets a timer with no delay that confirms it with the server.
+        if not synced:
+            self.sync()
+
+    def remove_threshold(self, seconds: int) -> None:
+        with self.__lock:
+            self.__thresholds.pop(seconds, None)
+            self.__schedule()
+
+    def stop(self) -> None:
+        with self.__lock:
+            self.__thresholds.clear()
+            self.__cancel_timer()
+
+    def __cancel_timer(self) -> None:
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+    def __schedule(self) -> None:
+        self.__cancel_timer()
+
+        armed = [threshold for (threshold, entry) in self.__thresholds.items() if entry['armed']]
+        if not armed or self.__synced_at is None:
+            return
+
+        # Wake up when the nearest threshold should be crossed, but never later than the resync interval so the
+        # estimate is corrected while waiting.
+        remaining = self.__predict(monotonic())
+        delay = min((remaining - max(armed)) / self.__rate if self.__rate > 0 else self.__resync_interval,
+                    self.__resync_interval)
+        self.__timer = Timer(max(delay, 0.0), self.__on_timer)
+        self.__timer.daemon = True
+        self.__timer.start()
+
+    def __on_timer(self) -> None:
+        if not self.__session.logged_in:
+            with self.__lock:
+                self.__timer = None
+            return
+
+        try:
+            self.sync()
+        except Exception:
+            with self.__lock:
+                if not any(entry['armed'] for entry in self.__thresholds.values()):
+                    return
+                self.__timer = Timer(self.__resync_interval, self.__on_timer)
+                self.__timer.daemon = True
+                self.__timer.start()
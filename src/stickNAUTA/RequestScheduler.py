@@ -0,0 +1,138 @@
+from __future__ import (annotations)
+
+from itertools import (count)
+from threading import (Condition)
+from time import (monotonic)
+from typing import (Optional, Union)
+
+INTERACTIVE: int = 0
+DEFAULT: int = 1
+BACKGROUND: int = 2
+
+
+class TokenBucket(object):
+    __rate: float
+    __capacity: float
+    __tokens: float
+    __updated: float
+
+    def __init__(self, rate: Union[int, float], capacity: Union[int, float]) -> None:
+        if type(rate) not in (int, float) or type(capacity) not in (int, float):
+            raise TypeError('rate and capacity must be an int() or float().')
+        elif rate <= 0 or capacity < 1:
+            raise ValueError('rate must be greater than 0 and capacity not less than 1.')
+
+        self.__rate = float(rate)
+        self.__capacity = float(capacity)
+        self.__tokens = float(capacity)
+        self.__updated = monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.__rate
+
+    @property
+    def capacity(self) -> float:
+        return self.__capacity
+
+    def get_delay(self, now: float) -> float:
+        self.__tokens = min(self.__capacity, self.__tokens + (now - self.__updated) * self.__rate)
+        self.__updated = now
+        return 0.0 if self.__tokens >= 1 else (1 - self.__tokens) / self.__rate
+
+    def take(self) -> None:
+        self.__tokens -= 1
+
+
+class RequestScheduler(object):
+    __host_limit: tuple
+    __host_limits: dict
+    __account_limit: Optional[tuple]
+    __buckets: dict
+    __waiters: list
+    __granted: set
+    __sequence: count
+    __condition: Condition
+
+    def __init__(self, host_rate: Union[int, float] = 5.0, host_burst: int = 10,
+                 account_rate: Union[int, float] = None, account_burst: int = 2, host_limits: dict = None) -> None:
+        host_limits = {} if host_limits is None else host_limits
+        if not isinstance(host_limits, dict):
+            raise TypeError('host_limits must be a dict() of host: (rate, burst).')
+
+        # Buckets are built once here only to validate the limits, the real ones are created per host and account.
+        for (rate, burst) in [(host_rate, host_burst), *host_limits.values()]:
+            TokenBucket(rate, burst)
+        if account_rate is not None:
+            TokenBucket(account_rate, account_burst)
+
+        self.__host_limit = (host_rate, host_burst)
+        self.__host_limits = dict(host_limits)
+        self.__account_limit = None if account_rate is None else (account_rate, account_burst)
+        self.__buckets = {}
+        self.__waiters = []
+        self.__granted = set()
+        self.__sequence = count()
+        self.__condition = Condition()
+
+    @property
+    def waiting(self) -> int:
+        with self.__condition:
+            return len(self.__waiters)
+
+    def __get_bucket(self, host: str, account: Optional[str] = None) -> Optional[TokenBucket]:
+        key = (host, account)
+        bucket = self.__buckets.get(key)
+        if bucket is None:
+            limit = self.__account_limit if account is not None else self.__host_limits.get(host, self.__host_limit)
+            bucket = self.__buckets[key] = TokenBucket(*limit)
+        return bucket
+
+    def __get_account_bucket(self, host: str, account: Optional[str]) -> Optional[TokenBucket]:
+        if account is None or self.__account_limit is None:
+            return None
+        return self.__get_bucket(host, account)
+
+    def acquire(self, host: str, account: str = None, priority: int = DEFAULT) -> float:
+        if type(host) is not str:
+            raise TypeError('host must be a str().')
+        elif type(priority) is not int:
+            raise TypeError('priority must be an int().')
+
+        started = monotonic()
+        with self.__condition:
+            waiter = (priority, next(self.__sequence), host, account)
+            self.__waiters.append(waiter)
+            try:
+                while True:
+                    delay = self.__dispatch(monotonic())
+                    if waiter in self.__granted:
+                        break
+                    self.__condition.wait(delay)
+            finally:
+                self.__waiters.remove(waiter)
+                self.__granted.discard(waiter)
+        return monotonic() - started
+
+    def __dispatch(self, now: float) -> Optional[float]:
+        # Whoever holds the lock hands the available tokens out to the best priority (then oldest) waiters of each
+        # host whose own account bucket lets them through, so an account at its limit does not hold back the rest of
+        # the queue. Granted waiters are woken up, the others sleep until the nearest token refill.
+        (granted, delays) = (False, [])
+        for waiter in sorted(waiter for waiter in self.__waiters if waiter not in self.__granted):
+            host_bucket = self.__get_bucket(waiter[2])
+            account_bucket = self.__get_account_bucket(waiter[2], waiter[3])
+            delay = max(host_bucket.get_delay(now), 0.0 if account_bucket is None else account_bucket.get_delay(now))
+            if delay:
+                delays.append(delay)
+                continue
+
+            host_bucket.take()
+            if account_bucket is not None:
+                account_bucket.take()
+            self.__granted.add(waiter)
+            granted = True
+
+        if granted:
+            self.__condition.notify_all()
+        return min(delays, default=None)
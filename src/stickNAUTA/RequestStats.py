@@ -0,0 +1,129 @@
+from __future__ import (annotations)
+
+from bisect import (bisect_left)
+from dataclasses import (dataclass)
+from threading import (Lock)
+from typing import (Optional)
+
+LATENCY_BUCKETS: tuple = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+@dataclass
+class RequestEvent(object):
+    __slots__ = ('operation', 'method', 'endpoint', 'status', 'size', 'elapsed', 'queued', 'attempts', 'backoff',
+                 'error')
+    operation: str
+    method: str
+    endpoint: str
+    status: int
+    size: int
+    elapsed: float
+    queued: float
+    attempts: int
+    backoff: float
+    # Set when no response came back (timeout, connection error, retries exhausted), status and size are 0 then.
+    error: Optional[BaseException]
+
+
+@dataclass
+class ParseEvent(object):
+    __slots__ = ('operation', 'parser', 'size', 'elapsed')
+    operation: str
+    parser: str
+    size: int
+    elapsed: float
+
+
+class Hooks(object):
+    def on_request(self, event: RequestEvent) -> None:
+        pass
+
+    def on_parse(self, event: ParseEvent) -> None:
+        pass
+
+
+class RequestStats(Hooks):
+    __buckets: tuple
+    __operations: dict
+    __lock: Lock
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS) -> None:
+        if not isinstance(buckets, (tuple, list)) or not len(buckets):
+            raise TypeError('buckets must be a non empty tuple() of seconds.')
+        elif list(buckets) != sorted(buckets):
+            raise ValueError('buckets must be sorted in ascending order.')
+
+        self.__buckets = tuple(buckets) if buckets[-1] == float('inf') else (*buckets, float('inf'))
+        self.__operations = {}
+        self.__lock = Lock()
+
+    @property
+    def buckets(self) -> tuple:
+        return self.__buckets
+
+    def __new_stats(self) -> dict:
+        return {
+            'requests': 0,
+            'errors': 0,
+            'bytes': 0,
+            'request_time': 0.0,
+            'max_request_time': 0.0,
+            'request_histogram': [0] * len(self.__buckets),
+            'queue_time': 0.0,
+            'max_queue_time': 0.0,
+            'retries': 0,
+            'backoff_time': 0.0,
+            'parses': 0,
+            'parse_time': 0.0,
+            'max_parse_time': 0.0,
+            'parse_histogram': [0] * len(self.__buckets)
+        }
+
+    def __get_operation(self, operation: str) -> dict:
+        stats = self.__operations.get(operation)
+        if stats is None:
+            stats = self.__operations[operation] = self.__new_stats()
+        return stats
+
+    def on_request(self, event: RequestEvent) -> None:
+        with self.__lock:
+            stats = self.__get_operation(event.operation)
+            stats['requests'] += 1
+            stats['errors'] += event.error is not None or event.status >= 400
+            stats['bytes'] += event.size
+            stats['request_time'] += event.elapsed
+            stats['max_request_time'] = max(stats['max_request_time'], event.elapsed)
+            stats['request_histogram'][bisect_left(self.__buckets, event.elapsed)] += 1
+            stats['queue_time'] += event.queued
+            stats['max_queue_time'] = max(stats['max_queue_time'], event.queued)
+            stats['retries'] += event.attempts - 1
+            stats['backoff_time'] += event.backoff
+
+    def on_parse(self, event: ParseEvent) -> None:
+        with self.__lock:
+            stats = self.__get_operation(event.operation)
+            stats['parses'] += 1
+            stats['parse_time'] += event.elapsed
+            stats['max_parse_time'] = max(stats['max_parse_time'], event.elapsed)
+            stats['parse_histogram'][bisect_left(self.__buckets, event.elapsed)] += 1
+
+    def get_stats(self, operation: Optional[str] = None) -> dict:
+        with self.__lock:
+            if operation is not None:
+                return self.__copy(self.__operations.get(operation) or self.__new_stats())
+            return {name: self.__copy(stats) for (name, stats) in self.__operations.items()}
+
+    def get_totals(self) -> dict:
+        with self.__lock:
+            totals = {key: sum(stats[key] for stats in self.__operations.values())
+                      for key in ('requests', 'errors', 'bytes', 'request_time', 'queue_time', 'retries',
+                                  'backoff_time', 'parses', 'parse_time')}
+        return totals
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__operations = {}
+
+    @staticmethod
+    def __copy(stats: dict) -> dict:
+        return {key: list(value) if isinstance(value, list) else value for (key, value) in stats.items()}
@@ -0,0 +1,175 @@
+from __future__ import (annotations)
+
+from copy import (deepcopy)
+from json import (dumps, loads)
+from sqlite3 import (Connection, connect)
+from threading import (Lock)
+from time import (time)
+from typing import (Iterable, Optional, Union)
+
+NAUTA_NAMESPACE: str = 'nauta'
+PORTAL_NAMESPACE: str = 'portal'
+
+
+class SessionStore(object):
+    __sessions: dict
+    __lock: Lock
+
+    def __init__(self) -> None:
+        self.__sessions = {}
+        self.__lock = Lock()
+
+    def __enter__(self) -> SessionStore:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    @staticmethod
+    def _expires_at(ttl: Optional[Union[int, float]]) -> Optional[float]:
+        if ttl is None:
+            return None
+        elif type(ttl) not in (int, float):
+            raise TypeError('ttl must be an int() or float() of seconds.')
+        elif ttl <= 0:
+            raise ValueError('ttl must be greater than 0.')
+        return time() + ttl
+
+    @staticmethod
+    def _check_sessions_data(sessions_data: dict) -> None:
+        if not isinstance(sessions_data, dict):
+            raise TypeError('sessions_data must be a dict() of username: session_data.')
+
+        for (username, session_data) in sessions_data.items():
+            if type(username) is not str:
+                raise TypeError('username must be a str().')
+            elif not isinstance(session_data, dict):
+                raise TypeError(f'session_data of "{username}" must be a dict().')
+
+    def get_session_data(self, namespace: str, username: str) -> Optional[dict]:
+        return self.get_all_session_data(namespace, [username]).get(username)
+
+    def set_session_data(self, namespace: str, username: str, session_data: dict,
+                         ttl: Union[int, float] = None) -> None:
+        self.set_all_session_data(namespace, {username: session_data}, ttl)
+
+    def get_all_session_data(self, namespace: str, usernames: Iterable[str] = None) -> dict:
+        now = time()
+        with self.__lock:
+            sessions = self.__sessions.get(namespace, {})
+            usernames = sessions.keys() if usernames is None else usernames
+            return {username: deepcopy(sessions[username][0]) for username in usernames
+                    if username in sessions and (sessions[username][2] is None or sessions[username][2] > now)}
+
+    def set_all_session_data(self, namespace: str, sessions_data: dict, ttl: Union[int, float] = None) -> None:
+        self._check_sessions_data(sessions_data)
+        (saved_at, expires_at) = (time(), self._expires_at(ttl))
+
+        with self.__lock:
+            sessions = self.__sessions.setdefault(namespace, {})
+            for (username, session_data) in sessions_data.items():
+                sessions[username] = (deepcopy(session_data), saved_at, expires_at)
+
+    def get_expiration(self, namespace: str, username: str) -> Optional[float]:
+        with self.__lock:
+            session = self.__sessions.get(namespace, {}).get(username)
+            return None if session is None else session[2]
+
+    def delete_session_data(self, namespace: str, username: str) -> None:
+        with self.__lock:
+            self.__sessions.get(namespace, {}).pop(username, None)
+
+    def purge_expired(self) -> int:
+        now = time()
+        purged = 0
+        with self.__lock:
+            for sessions in self.__sessions.values():
+                for username in [username for (username, (_, _, expires_at)) in sessions.items()
+                                 if expires_at is not None and expires_at <= now]:
+                    del sessions[username]
+                    purged += 1
+        return purged
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteSessionStore(SessionStore):
+    __connection: Connection
+    __lock: Lock
+
+    def __init__(self, file_path: str = ':memory:', timeout: float = 30.0) -> None:
+        if type(file_path) is not str:
+            raise TypeError('file_path must be a str().')
+
+        super().__init__()
+        self.__lock = Lock()
+        self.__connection = connect(file_path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        if file_path != ':memory:':
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS sessions ('
+                                  'namespace TEXT NOT NULL, '
+                                  'username TEXT NOT NULL, '
+                                  'session_data TEXT NOT NULL, '
+                                  'saved_at REAL NOT NULL, '
+                                  'expires_at REAL, '
+                                  'PRIMARY KEY (namespace, username))')
+
+    def get_session_data(self, namespace: str, username: str) -> Optional[dict]:
+        with self.__lock:
+            row = self.__connection.execute('SELECT session_data FROM sessions WHERE namespace = ? AND username = ? '
+                                            'AND (expires_at IS NULL OR expires_at > ?)',
+                                            (namespace, username, time())).fetchone()
+        return None if row is None else loads(row[0])
+
+    def get_all_session_data(self, namespace: str, usernames: Iterable[str] = None) -> dict:
+        query = 'SELECT username, session_data FROM sessions WHERE namespace = ? AND ' \
+                '(expires_at IS NULL OR expires_at > ?)'
+        with self.__lock:
+            rows = self.__connection.execute(query, (namespace, time())).fetchall()
+
+        if usernames is None:
+            return {username: loads(session_data) for (username, session_data) in rows}
+
+        usernames = set(usernames)
+        return {username: loads(session_data) for (username, session_data) in rows if username in usernames}
+
+    def set_all_session_data(self, namespace: str, sessions_data: dict, ttl: Union[int, float] = None) -> None:
+        self._check_sessions_data(sessions_data)
+        (saved_at, expires_at) = (time(), self._expires_at(ttl))
+        rows = [(namespace, username, dumps(session_data), saved_at, expires_at)
+                for (username, session_data) in sessions_data.items()]
+
+        # One transaction for the whole batch: either every account is saved or none is. INSERT OR REPLACE rewrites
+        # every column anyway and, unlike ON CONFLICT DO UPDATE (SQLite 3.24+), works with the older SQLite some
+        # Python 3.7 builds ship.
+        with self.__lock:
+            self.__connection.execute('BEGIN IMMEDIATE')
+            try:
+                self.__connection.executemany(
+                    'INSERT OR REPLACE INTO sessions (namespace, username, session_data, saved_at, expires_at) '
+                    'VALUES (?, ?, ?, ?, ?)', rows)
+            except BaseException:
+                self.__connection.execute('ROLLBACK')
+                raise
+            self.__connection.execute('COMMIT')
+
+    def get_expiration(self, namespace: str, username: str) -> Optional[float]:
+        with self.__lock:
+            row = self.__connection.execute('SELECT expires_at FROM sessions WHERE namespace = ? AND username = ?',
+                                            (namespace, username)).fetchone()
+        return None if row is None else row[0]
+
+    def delete_session_data(self, namespace: str, username: str) -> None:
+        with self.__lock:
+            self.__connection.execute('DELETE FROM sessions WHERE namespace = ? AND username = ?',
+                                      (namespace, username))
+
+    def purge_expired(self) -> int:
+        with self.__lock:
+            return self.__connection.execute('DELETE FROM sessions WHERE expires_at IS NOT NULL AND expires_at <= ?',
+                                             (time(),)).rowcount
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
@@ -0,0 +1,183 @@
+from __future__ import (annotations)
+
+from threading import (Event, Lock, Thread)
+from typing import (Callable, Iterable, Optional, Union)
+
+from .NautaSession import (NautaSession)
+from ._parsing import (remaining_time_to_seconds)
+
+ONLINE: str = 'online'
+UNKNOWN: str = 'unknown'
+LOST: str = 'lost'
+OFFLINE: str = 'offline'
+STOPPED: str = 'stopped'
+
+
+class SessionWatchdog(object):
+    __interval: float
+    __relogin: bool
+    __on_state_change: Optional[Callable[[NautaSession, str, Optional[Exception]], None]]
+    __sessions: dict
+    __lock: Lock
+    __check_lock: Lock
+    __stop_event: Event
+    __thread: Thread = None
+
+    def __init__(self, sessions: Iterable[NautaSession] = (), interval: Union[int, float] = 60.0,
+                 relogin: bool = True,
+                 on_state_change: Callable[[NautaSession, str, Optional[Exception]], None] = None) -> None:
+        if type(interval) not in (int, float):
+            raise TypeError('interval must be an int() or float() of seconds.')
+        elif on_state_change is not None and not callable(on_state_change):
+            raise TypeError('on_state_change must be callable.')
+        elif interval <= 0:
+            raise ValueError('interval must be greater than 0.')
+
+        self.__interval = float(interval)
+        self.__relogin = relogin
+        self.__on_state_change = on_state_change
+        self.__sessions = {}
+        self.__lock = Lock()
+        self.__check_lock = Lock()
+        self.__stop_event = Event()
+
+        for session in sessions:
+            self.add(session)
+
+    def __enter__(self) -> SessionWatchdog:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    @property
+    def interval(self) -> float:
+        return self.__interval
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    @property
+    def usernames(self) -> list:
+        with self.__lock:
+            return list(self.__sessions.keys())
+
+    def add(self, session: NautaSession) -> None:
+        if not isinstance(session, NautaSession):
+            raise TypeError('session must be a NautaSession().')
+
+        with self.__lock:
+            if session.username in self.__sessions:
+                raise ValueError(f'Account "{session.username}" is already watched.')
+            self.__sessions[session.username] = [session, ONLINE if session.logged_in else OFFLINE]
+
+    def remove(self, username: str) -> NautaSession:
+        with self.__lock:
+            if username not in self.__sessions:
+                raise KeyError(f'Account "{username}" is not watched.')
+            return self.__sessions.pop(username)[0]
+
+    def get_state(self, username: str) -> str:
+        with self.__lock:
+            if username not in self.__sessions:
+                raise KeyError(f'Account "{username}" is not watched.')
+            return self.__sessions[username][1]
+
+    def get_states(self) -> dict:
+        with self.__lock:
+            return {username: state for (username, (_, state)) in self.__sessions.items()}
+
+    def start(self) -> None:
+        if self.running:
+            raise RuntimeError('Watchdog is already running.')
+
+        self.__stop_event.clear()
+        self.__thread = Thread(target=self.__run, name='SessionWatchdog', daemon=True)
+        self.__thread.start()
+
+    def stop(self, logout: bool = True) -> None:
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+        if logout:
+            for entry in self.__get_entries():
+                if entry[0].logged_in:
+                    try:
+                        entry[0].logout()
+                    except Exception as exception:
+                        self.__set_state(entry, STOPPED, exception)
+                    else:
+                        self.__set_state(entry, STOPPED)
+
+    def check(self) -> dict:
+        # One pass over every watched session, also used by the background thread. Each poll is a single tiny
+        # remaining time query, so a pass over hundreds of accounts fits in one thread.
+        with self.__check_lock:
+            for entry in self.__get_entries():
+                if self.__stop_event.is_set():
+                    break
+                try:
+                    self.__check_session(entry)
+                except Exception:
+                    pass
+        return self.get_states()
+
+    def __get_entries(self) -> list:
+        with self.__lock:
+            return list(self.__sessions.values())
+
+    def __set_state(self, entry: list, state: str, exception: Exception = None) -> None:
+        with self.__lock:
+            changed = entry[1] != state
+            entry[1] = state
+
+        # A failing callback must not stop the watchdog for every other session.
+        if changed and self.__on_state_change is not None:
+            try:
+                self.__on_state_change(entry[0], state, exception)
+            except Exception:
+                pass
+
+    def __check_session(self, entry: list) -> None:
+        session = entry[0]
+        if not session.logged_in and entry[1] != LOST:
+            # Logged out by its owner or never logged in, so there is nothing to keep alive.
+            self.__set_state(entry, OFFLINE)
+            return
+
+        if session.logged_in:
+            # Timeouts, connection and HTTP errors say nothing about the session itself, so it is polled again on the
+            # next pass. Logging in again on them would turn a flaky network into a login storm over every account.
+            try:
+                remaining_time = session.get_remaining_time()
+            except Exception as exception:
+                self.__set_state(entry, UNKNOWN, exception)
+                return
+
+            # Only an answer that is not a remaining time (e.g. "errorop") means the server dropped the session.
+            try:
+                remaining_time_to_seconds(remaining_time)
+            except ValueError:
+                self.__set_state(entry, LOST, RuntimeError(f'Session rejected by the server: "{remaining_time}".'))
+            else:
+                self.__set_state(entry, ONLINE)
+                return
+
+        # A failed relogin leaves the session lost, so it is tried again on the next pass.
+        if self.__relogin:
+            try:
+                session.relogin()
+            except Exception:
+                return
+            self.__set_state(entry, ONLINE)
+
+    def __run(self) -> None:
+        while not self.__stop_event.wait(self.__interval):
+            try:
+                self.check()
+            except Exception:
+                pass
@@ -0,0 +1,59 @@
+from __future__ import (annotations)
+
+from threading import (Lock)
+from time import (monotonic)
+from typing import (Any, Hashable, Optional, Union)
+
+
+class TTLCache(object):
+    __ttls: dict
+    __entries: dict
+    __lock: Lock
+
+    def __init__(self, ttls: dict = None) -> None:
+        ttls = {} if ttls is None else ttls
+        if not isinstance(ttls, dict):
+            raise TypeError('ttls must be a dict() of resource: seconds.')
+
+        for (resource, ttl) in ttls.items():
+            if type(resource) is not str:
+                raise TypeError('resource must be a str().')
+            elif ttl is not None and type(ttl) not in (int, float):
+                raise TypeError(f'ttl of "{resource}" must be an int() or float() of seconds.')
+            elif ttl is not None and ttl <= 0:
+                raise ValueError(f'ttl of "{resource}" must be greater than 0.')
+
+        self.__ttls = {resource: float(ttl) for (resource, ttl) in ttls.items() if ttl is not None}
+        self.__entries = {}
+        self.__lock = Lock()
+
+    @property
+    def ttls(self) -> dict:
+        return dict(self.__ttls)
+
+    def get(self, resource: str, *key: Hashable) -> Optional[Any]:
+        with self.__lock:
+            entry = self.__entries.get((resource, *key))
+            if entry is None:
+                return None
+            elif entry[1] <= monotonic():
+                del self.__entries[(resource, *key)]
+                return None
+            return entry[0]
+
+    def set(self, resource: str, value: Any, *key: Hashable) -> None:
+        ttl = self.__ttls.get(resource)
+        if ttl is None:
+            return
+
+        with self.__lock:
+            self.__entries[(resource, *key)] = (value, monotonic() + ttl)
+
+    def invalidate(self, resource: Union[str, None] = None, *key: Hashable) -> int:
+        # Keys are matched by prefix: invalidate('summary', 'recharge_detail') drops the summaries of every month.
+        prefix = () if resource is None else (resource, *key)
+        with self.__lock:
+            keys = [entry_key for entry_key in self.__entries.keys() if entry_key[:len(prefix)] == prefix]
+            for entry_key in keys:
+                del self.__entries[entry_key]
+        return len(keys)
@@ -0,0 +1,228 @@
+from __future__ import (annotations)
+
+from asyncio import (TimeoutError as AsyncTimeoutError, sleep as async_sleep)
+from random import (random)
+from threading import (Lock)
+from time import (perf_counter, sleep)
+from typing import (Any, Callable, Optional, Tuple, Union)
+
+from requests import (ConnectionError, Response, Session, Timeout)
+from requests.adapters import (HTTPAdapter)
+
+try:
+    from aiohttp import (ClientConnectionError, ClientResponse, ClientSession, ClientTimeout, TraceConfig)
+except ImportError:
+    ClientConnectionError = ClientResponse = ClientSession = ClientTimeout = TraceConfig = None
+
+RETRY_STATUSES: tuple = (429, 500, 502, 503, 504)
+
+
+class TransportPolicy(object):
+    __retries: int
+    __backoff_factor: float
+    __backoff_max: float
+    __jitter: float
+    __retry_statuses: tuple
+    __timeout: Optional[Tuple[float, float]]
+    __pool_connections: int
+    __pool_maxsize: int
+    __pool_block: bool
+    __shared: bool
+    __adapter: HTTPAdapter = None
+    __lock: Lock
+
+    # Every client builds one of these when given none, so the defaults keep the plain requests behaviour: a single
+    # attempt and no timeout. Retries and timeouts are opted into, e.g. TransportPolicy(retries=3, timeout=(10, 60)).
+    def __init__(self, retries: int = 0, backoff_factor: float = 0.5, backoff_max: float = 30.0, jitter: float = 0.5,
+                 retry_statuses: tuple = RETRY_STATUSES, timeout: Optional[Union[float, Tuple[float, float]]] = None,
+                 pool_connections: int = 4, pool_maxsize: int = 16, pool_block: bool = False,
+                 shared: bool = False) -> None:
+        if type(retries) is not int:
+            raise TypeError('retries must be an int().')
+        elif type(backoff_factor) not in (int, float) or type(backoff_max) not in (int, float):
+            raise TypeError('backoff_factor and backoff_max must be an int() or float() of seconds.')
+        elif type(jitter) not in (int, float):
+            raise TypeError('jitter must be a float().')
+        elif not isinstance(retry_statuses, (tuple, list, set, frozenset)):
+            raise TypeError('retry_statuses must be a tuple() of HTTP codes.')
+        elif type(pool_connections) is not int or type(pool_maxsize) is not int:
+            raise TypeError('pool_connections and pool_maxsize must be an int().')
+
+        if retries < 0:
+            raise ValueError('retries must not be negative.')
+        elif backoff_factor < 0 or backoff_max < 0:
+            raise ValueError('backoff_factor and backoff_max must not be negative.')
+        elif not 0 <= jitter <= 1:
+            raise ValueError('jitter must be between 0 and 1.')
+        elif pool_connections < 1 or pool_maxsize < 1:
+            raise ValueError('pool_connections and pool_maxsize must be greater than 0.')
+
+        if timeout is not None and not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        if timeout is not None and (len(timeout) != 2 or any(type(value) not in (int, float) or value <= 0
+                                                               for value in timeout)):
+            raise ValueError('timeout must be a positive number of seconds or a (connect, read) tuple() of them.')
+
+        self.__retries = retries
+        self.__backoff_factor = float(backoff_factor)
+        self.__backoff_max = float(backoff_max)
+        self.__jitter = float(jitter)
+        self.__retry_statuses = tuple(retry_statuses)
+        self.__timeout = None if timeout is None else (float(timeout[0]), float(timeout[1]))
+        self.__pool_connections = pool_connections
+        self.__pool_maxsize = pool_maxsize
+        self.__pool_block = pool_block
+        self.__shared = shared
+        self.__lock = Lock()
+
+    @property
+    def retries(self) -> int:
+        return self.__retries
+
+    @property
+    def retry_statuses(self) -> tuple:
+        return self.__retry_statuses
+
+    @property
+    def timeout(self) -> Optional[Tuple[float, float]]:
+        return self.__timeout
+
+    @property
+    def pool_maxsize(self) -> int:
+        return self.__pool_maxsize
+
+    @property
+    def shared(self) -> bool:
+        return self.__shared
+
+    def __new_adapter(self) -> HTTPAdapter:
+        return HTTPAdapter(pool_connections=self.__pool_connections, pool_maxsize=self.__pool_maxsize,
+                           pool_block=self.__pool_block)
+
+    def mount(self, session: Session) -> Session:
+        # A shared policy mounts one adapter, and so one keep-alive connection pool per host, into every session.
+        # Cookies stay in each Session and CSRF tokens in each client, so accounts only share the sockets.
+        if self.__shared:
+            with self.__lock:
+                if self.__adapter is None:
+                    self.__adapter = self.__new_adapter()
+                adapter = self.__adapter
+        else:
+            adapter = self.__new_adapter()
+
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close_session(self, session: Session) -> None:
+        # Session.close() closes every mounted adapter. The shared one belongs to this policy and the other clients
+        # still use it, so it is unmounted first and only close() below closes it.
+        if self.__shared:
+            with self.__lock:
+                adapter = self.__adapter
+            for (prefix, mounted) in list(session.adapters.items()):
+                if mounted is adapter:
+                    del session.adapters[prefix]
+        session.close()
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__adapter is not None:
+                self.__adapter.close()
+                self.__adapter = None
+
+    def get_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after is not None and retry_after.strip().isdigit():
+            return min(float(retry_after), self.__backoff_max)
+
+        delay = min(self.__backoff_factor * 2 ** attempt, self.__backoff_max)
+        return delay * (1 - self.__jitter * random())
+
+    def should_retry(self, attempt: int, idempotent: bool, status: Optional[int] = None) -> bool:
+        return idempotent and attempt < self.__retries and (status is None or status in self.__retry_statuses)
+
+    def request(self, session: Session, method: str, url: str, data: dict = None, idempotent: bool = None,
+                before_send: Callable[[], Any] = None, timing: dict = None) -> Response:
+        # Only requests that can be repeated safely are retried: GETs and explicitly flagged read only POSTs.
+        idempotent = method == 'GET' if idempotent is None else idempotent
+
+        # timing, when given, gets the time on the wire of every attempt ('elapsed') apart from the time spent in
+        # before_send ('queued', e.g. in a RequestScheduler) and sleeping between retries ('backoff'), so neither rate
+        # limiting nor backoff read as request latency.
+        timing = {} if timing is None else timing
+        timing.update(elapsed=0.0, queued=0.0, backoff=0.0, attempts=0)
+
+        attempt = 0
+        while True:
+            if before_send is not None:
+                queue_started = perf_counter()
+                before_send()
+                timing['queued'] += perf_counter() - queue_started
+
+            timing['attempts'] += 1
+            started = perf_counter()
+            try:
+                response = session.request(method, url, data=data, timeout=self.__timeout)
+            except (ConnectionError, Timeout):
+                if not self.should_retry(attempt, idempotent):
+                    raise
+                delay = self.get_delay(attempt)
+            else:
+                if not self.should_retry(attempt, idempotent, response.status_code):
+                    return response
+                delay = self.get_delay(attempt, response.headers.get('Retry-After'))
+            finally:
+                timing['elapsed'] += perf_counter() - started
+
+            timing['backoff'] += delay
+            sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def new_trace_config() -> TraceConfig:
+        # aiohttp has no before_send, the wait for a free connection of the connector is what async requests queue on.
+        async def on_queued_start(session: ClientSession, context: Any, params: Any) -> None:
+            context.queued_started = perf_counter()
+
+        async def on_queued_end(session: ClientSession, context: Any, params: Any) -> None:
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx['queued'] += perf_counter() - context.queued_started
+
+        trace_config = TraceConfig()
+        trace_config.on_connection_queued_start.append(on_queued_start)
+        trace_config.on_connection_queued_end.append(on_queued_end)
+        return trace_config
+
+    async def request_async(self, session: ClientSession, method: str, url: str, data: dict = None,
+                            idempotent: bool = None, timing: dict = None) -> Tuple[ClientResponse, bytes]:
+        # The same retries, backoff and timing as request(), for sessions given a trace config from new_trace_config().
+        idempotent = method == 'GET' if idempotent is None else idempotent
+        timing = {} if timing is None else timing
+        timing.update(elapsed=0.0, queued=0.0, backoff=0.0, attempts=0)
+
+        # Without a timeout of its own the request keeps the session's, as before policies applied to async clients.
+        options = {} if self.__timeout is None else {
+            'timeout': ClientTimeout(sock_connect=self.__timeout[0], sock_read=self.__timeout[1])
+        }
+
+        attempt = 0
+        while True:
+            timing['attempts'] += 1
+            (started, queued) = (perf_counter(), timing['queued'])
+            try:
+                async with session.request(method, url, data=data, trace_request_ctx=timing, **options) as response:
+                    content = await response.read()
+            except (ClientConnectionError, AsyncTimeoutError):
+                if not self.should_retry(attempt, idempotent):
+                    raise
+                delay = self.get_delay(attempt)
+            else:
+                if not self.should_retry(attempt, idempotent, response.status):
+                    return response, content
+                delay = self.get_delay(attempt, response.headers.get('Retry-After'))
+            finally:
+                timing['elapsed'] += perf_counter() - started - (timing['queued'] - queued)
+
+            timing['backoff'] += delay
+            await async_sleep(delay)
+            attempt += 1
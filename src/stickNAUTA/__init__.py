@@ -1,6 +1,27 @@
+from .AsyncNautaSession import (AsyncNautaSession)
+from .AsyncPortalNauta import (AsyncPortalNauta)
+from .HistoryStore import (HistoryStore, SQLiteHistoryStore)
+from .NautaFleet import (FleetReport, NautaFleet)
 from .NautaSession import (NautaSession)
-from .PortalNauta import (PortalNauta)
+from .NautaSessionPool import (NautaSessionPool)
+from .PageCache import (PageCache, SQLitePageCache)
+from .PortalNauta import (PortalError, PortalNauta)
+from .RemainingTimeClock import (RemainingTimeClock)
+from .RequestScheduler import (RequestScheduler)
+from .RequestStats import (Hooks, ParseEvent, RequestEvent, RequestStats)
+from .SessionStore import (SQLiteSessionStore, SessionStore)
+from .SessionWatchdog import (SessionWatchdog)
+from .TransportPolicy import (TransportPolicy)
+from .bulk import (RechargeReport, TransferReport, get_fleet_details, login_portals, recharge_accounts,
+                    transfer_balances)
+from .records import (AccountData, ConnectionSession, Recharge, Transfer, UserInfo, UserSession)
 
 __version__ = '2.0.3'
-__all__ = ['NautaSession', 'PortalNauta']
+__all__ = ['NautaSession', 'PortalNauta', 'AsyncNautaSession', 'AsyncPortalNauta', 'HistoryStore', 'AccountData',
+           'ConnectionSession', 'Recharge', 'Transfer', 'UserInfo', 'UserSession', 'NautaFleet',
+           'FleetReport', 'Hooks', 'RequestEvent', 'ParseEvent', 'RequestStats',
+           'RemainingTimeClock', 'SessionStore', 'SQLiteSessionStore', 'TransportPolicy', 'PortalError',
+           'RechargeReport', 'recharge_accounts', 'TransferReport', 'transfer_balances',
+           'SessionWatchdog', 'login_portals', 'RequestScheduler',
+           'NautaSessionPool', 'PageCache', 'SQLitePageCache', 'get_fleet_details', 'SQLiteHistoryStore']
 __author__ = 'stickM4N jcgalindo.jcgh@gmail.com'
@@ -0,0 +1,20 @@
+from json import (dump)
+from os import (fdopen, remove, replace)
+from os.path import (abspath, basename, dirname, exists)
+from tempfile import (mkstemp)
+from typing import (Any)
+
+
+def dump_json_atomically(data: Any, file_path: str) -> None:
+    # Every save writes a temporary file of its own next to the target and renames it over it: readers never see a half
+    # written file, concurrent saves do not share a temporary name and a failed dump leaves nothing behind.
+    (descriptor, temporary_path) = mkstemp(prefix=f'{basename(file_path)}.', suffix='.tmp',
+                                           dir=dirname(abspath(file_path)))
+    try:
+        with fdopen(descriptor, 'w') as file:
+            dump(data, file)
+        replace(temporary_path, file_path)
+    except BaseException:
+        if exists(temporary_path):
+            remove(temporary_path)
+        raise
@@ -0,0 +1,287 @@
+from datetime import (datetime)
+from re import (compile as re_compile)
+from threading import (local)
+from typing import (Optional, Tuple)
+
+from lxml import (etree, html)
+
+from .records import (AccountData, ConnectionSession, Recharge, Transfer, UserInfo, UserSession)
+
+DETAILS_LAYOUTS: dict = {
+    'service_detail': ('connection details', 'connections',
+                       ('total_time', 'total_import', 'upload_traffic', 'download_traffic', 'total_traffic'),
+                       'all_sessions',
+                       ('start_datetime', 'end_datetime', 'duration', 'upload_traffic', 'download_traffic', 'import')),
+    'recharge_detail': ('recharge details', 'recharges', ('total_import',),
+                        'all_recharges', ('datetime', 'import', 'channel', 'type')),
+    'transfer_detail': ('transfer details', 'transfers', ('total_import',),
+                        'all_transfers', ('datetime', 'import', 'target_account'))
+}
+
+# Every page layout the library depends on. A layout change on the ETECSA side should only need an edit here.
+XPATHS: dict = {
+    'wlanuserip': etree.XPath('//*[@id="wlanuserip"]/@value'),
+    'CSRFHW': etree.XPath('//*[@name="CSRFHW"]/@value'),
+    'user_info': etree.XPath('//*[@id="sessioninfo"]//tr/td[2]'),
+    'user_sessions': etree.XPath('//*[@id="sesiontraza"]//tr[td]'),
+    'csrf': etree.XPath('//*[@name="csrf"]/@value'),
+    'account_data': etree.XPath('//*[@id="content"]/div[2]/div/div/div/div[position() >= 2]/div/p'),
+    'year_months': etree.XPath('//*[@name="year_month"]/option/@value'),
+    'details_summary': etree.XPath('//*[@class="card-stats-number"]'),
+    'details_rows': etree.XPath('//table//tr[td]'),
+    'details_cells_text': etree.XPath('//table//tr[td]/td/text()', smart_strings=False),
+    'details_cells_count': etree.XPath('count(//table//tr[td]/td)')
+}
+ALERT_REGEX = re_compile(r'alert\("(?P<_>[^"]*?)"\)')
+ATTRIBUTE_UUID_REGEX = re_compile(r'ATTRIBUTE_UUID=(\w+)&CSRFHW=')
+PORTAL_ERROR_REGEX = re_compile(r"toastr.error\('<ul><li class=\"msg_error\">(.*)<ul>")
+PORTAL_SUB_ERRORS_REGEX = re_compile(r"<li class=\"sub-message\">(.*)</li></ul></li></ul>'")
+NUMBER_REGEX = re_compile(r'-?[\d.,]*\d')
+TRAFFIC_UNIT_REGEX = re_compile(r'([KMGT]?B)\s*$')
+
+USER_INFO_KEYS: tuple = ('account_state', 'credit', 'expiration_date', 'access_areas')
+ACCOUNT_DATA_KEYS: tuple = ('username', 'blocking_date', 'elimination_date', 'account_type', 'service_type',
+                            'available_balance', 'remaining_time', 'email_account')
+
+DATETIME_FORMATS: tuple = ('%d/%m/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M', '%Y-%m-%d %H:%M', '%d/%m/%Y',
+                           '%Y-%m-%d', '%d-%m-%Y %H:%M:%S', '%d-%m-%Y')
+DETAILS_PAGE_SIZE: int = 15
+TRAFFIC_UNITS: dict = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+_thread_data = local()
+
+
+def to_datetime(value: str) -> Optional[datetime]:
+    value = value.strip()
+    if not any(char.isdigit() for char in value):
+        return None
+
+    for datetime_format in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, datetime_format)
+        except ValueError:
+            pass
+    raise ValueError(f'Unknown datetime format: "{value}".')
+
+
+def to_seconds(value: str) -> Optional[int]:
+    value = value.strip()
+    if not any(char.isdigit() for char in value):
+        return None
+
+    return remaining_time_to_seconds(value)
+
+
+def to_number(value: str) -> Optional[float]:
+    number = NUMBER_REGEX.search(value)
+    if not number:
+        return None
+
+    number = number.group(0)
+    if ',' in number and '.' in number:
+        (thousands, decimal) = (',', '.') if number.rindex('.') > number.rindex(',') else ('.', ',')
+        number = number.replace(thousands, '').replace(decimal, '.')
+    else:
+        number = number.replace(',', '.')
+    return float(number)
+
+
+def to_bytes(value: str) -> Optional[int]:
+    number = to_number(value)
+    if number is None:
+        return None
+
+    unit = TRAFFIC_UNIT_REGEX.search(value.strip().upper())
+    return round(number * TRAFFIC_UNITS[unit.group(1) if unit else 'B'])
+
+
+def to_int(value: str) -> Optional[int]:
+    number = to_number(value)
+    return None if number is None else int(number)
+
+
+SUMMARY_CONVERTERS: dict = {
+    'connections': to_int,
+    'recharges': to_int,
+    'transfers': to_int,
+    'total_time': to_seconds,
+    'total_import': to_number,
+    'upload_traffic': to_bytes,
+    'download_traffic': to_bytes,
+    'total_traffic': to_bytes
+}
+
+
+def to_connection_session(start_datetime: str, end_datetime: str, duration: str, upload_traffic: str,
+                          download_traffic: str, cost: str) -> ConnectionSession:
+    return ConnectionSession(to_datetime(start_datetime), to_datetime(end_datetime), to_seconds(duration),
+                             to_bytes(upload_traffic), to_bytes(download_traffic), to_number(cost))
+
+
+def to_recharge(recharge_datetime: str, amount: str, channel: str, recharge_type: str) -> Recharge:
+    return Recharge(to_datetime(recharge_datetime), to_number(amount), channel, recharge_type)
+
+
+def to_transfer(transfer_datetime: str, amount: str, target_account: str) -> Transfer:
+    return Transfer(to_datetime(transfer_datetime), to_number(amount), target_account)
+
+
+RECORD_BUILDERS: dict = {
+    'service_detail': to_connection_session,
+    'recharge_detail': to_recharge,
+    'transfer_detail': to_transfer
+}
+
+
+def to_user_info(user_info: dict) -> UserInfo:
+    return UserInfo(user_info['account_state'], to_number(user_info['credit']),
+                    to_datetime(user_info['expiration_date']), user_info['access_areas'],
+                    tuple(UserSession(to_datetime(session['start']), to_datetime(session['end']),
+                                      to_seconds(session['duration'])) for session in user_info['sessions']))
+
+
+def to_account_data(account_data: dict) -> AccountData:
+    return AccountData(account_data['username'], to_datetime(account_data['blocking_date']),
+                       to_datetime(account_data['elimination_date']), account_data['account_type'],
+                       account_data['service_type'], to_number(account_data['available_balance']),
+                       to_seconds(account_data['remaining_time']), account_data['email_account'])
+
+
+def remaining_time_to_seconds(remaining_time: str) -> int:
+    (hours, minutes, seconds) = [int(number) for number in remaining_time.split(':')]
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def seconds_to_remaining_time(seconds: int) -> str:
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+
+def details_pages(count: str) -> range:
+    return range(1, int(int(count) / DETAILS_PAGE_SIZE) + 2)
+
+
+def _parse_tree(content: bytes, encoding: Optional[str], page: str) -> etree.ElementBase:
+    parsers = getattr(_thread_data, 'parsers', None)
+    if parsers is None:
+        parsers = _thread_data.parsers = {}
+
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = html.HTMLParser(encoding=encoding)
+
+    html_tree = etree.fromstring(content, parser) if content.strip() else None
+    if html_tree is None:
+        raise RuntimeError(f'Failed to parse {page}: the page is empty.')
+    return html_tree
+
+
+def _text(element: etree.ElementBase) -> str:
+    return (element.text_content() if len(element) else element.text or '').strip()
+
+
+def _extract(html_tree: etree.ElementBase, name: str, page: str, count: int = 1) -> list:
+    values = XPATHS[name](html_tree)
+    if len(values) < count:
+        raise RuntimeError(f'Failed to parse {page}: expected {count} "{name}" value(s) but found {len(values)}. '
+                           f'The page layout probably changed.')
+    return values
+
+
+def parse_alert(text: str) -> Optional[str]:
+    alert = ALERT_REGEX.search(text)
+    return alert.group(1) if alert else None
+
+
+def parse_attribute_uuid(text: str) -> str:
+    return ATTRIBUTE_UUID_REGEX.search(text).group(1)
+
+
+def parse_portal_error(text: str) -> Optional[Tuple[str, str]]:
+    main_error = PORTAL_ERROR_REGEX.search(text)
+    if not main_error:
+        return None
+
+    derived_errors = PORTAL_SUB_ERRORS_REGEX.search(text).group(1).split('</li><li class="sub-message">')
+    return main_error.group(1), ', '.join(f'"{error}"' for error in derived_errors)
+
+
+def parse_login_page(content: bytes, encoding: str = None) -> Tuple[str, str]:
+    html_tree = _parse_tree(content, encoding, 'login page')
+    return str(_extract(html_tree, 'wlanuserip', 'login page')[0]), str(_extract(html_tree, 'CSRFHW', 'login page')[0])
+
+
+def parse_user_info(content: bytes, encoding: str = None) -> dict:
+    html_tree = _parse_tree(content, encoding, 'user info')
+    user_info = dict(zip(USER_INFO_KEYS, map(_text, _extract(html_tree, 'user_info', 'user info',
+                                                              len(USER_INFO_KEYS)))))
+    user_info['sessions'] = [dict(zip(('start', 'end', 'duration'), map(_text, row)))
+                             for row in XPATHS['user_sessions'](html_tree)]
+    return user_info
+
+
+def parse_csrf(content: bytes, encoding: str = None) -> str:
+    return str(_extract(_parse_tree(content, encoding, 'portal login page'), 'csrf', 'portal login page')[0])
+
+
+def parse_account_data(content: bytes, encoding: str = None) -> dict:
+    html_tree = _parse_tree(content, encoding, 'account data')
+    return dict(zip(ACCOUNT_DATA_KEYS, map(_text, _extract(html_tree, 'account_data', 'account data',
+                                                           len(ACCOUNT_DATA_KEYS)))))
+
+
+def parse_year_months(content: bytes, encoding: str = None) -> list:
+    return [str(year_month) for year_month in XPATHS['year_months'](_parse_tree(content, encoding, 'details'))]
+
+
+def parse_details_summary(content: bytes, list_type: str, typed: bool = False, encoding: str = None) -> dict:
+    (name, count_key, summary_keys, rows_key, _) = DETAILS_LAYOUTS[list_type]
+    keys = (count_key, *summary_keys)
+
+    html_tree = _parse_tree(content, encoding, f'{name} summary')
+    summary = dict(zip(keys, map(_text, _extract(html_tree, 'details_summary', f'{name} summary', len(keys)))))
+    if typed:
+        summary = {key: SUMMARY_CONVERTERS[key](value) for (key, value) in summary.items()}
+    summary[rows_key] = []
+    return summary
+
+
+def parse_details_cells(content: bytes, list_type: str, encoding: str = None) -> list:
+    (name, _, _, _, row_keys) = DETAILS_LAYOUTS[list_type]
+
+    html_tree = _parse_tree(content, encoding, name)
+    width = len(row_keys)
+
+    # Fast path: one text node per cell. Empty or nested cells fall back to walking every row.
+    cells = XPATHS['details_cells_text'](html_tree)
+    if len(cells) == XPATHS['details_cells_count'](html_tree) and not len(cells) % width:
+        return [cell.strip() for cell in cells]
+
+    cells = []
+    for row in XPATHS['details_rows'](html_tree):
+        row_cells = [_text(cell) for cell in row.iterchildren('td')]
+        if len(row_cells) != width:
+            raise RuntimeError(f'Failed to parse {name}: expected {width} columns per row but found '
+                               f'{len(row_cells)}. The page layout probably changed.')
+        cells.extend(row_cells)
+    return cells
+
+
+def build_details_rows(cells: list, list_type: str, typed: bool = False) -> list:
+    row_keys = DETAILS_LAYOUTS[list_type][4]
+    width = len(row_keys)
+
+    if typed:
+        build = RECORD_BUILDERS[list_type]
+        return [build(*cells[j:j + width]) for j in range(0, len(cells), width)]
+    return [dict(zip(row_keys, cells[j:j + width])) for j in range(0, len(cells), width)]
+
+
+def parse_details_rows(content: bytes, list_type: str, typed: bool = False, encoding: str = None) -> list:
+    return build_details_rows(parse_details_cells(content, list_type, encoding), list_type, typed)
+
+
+def parse_details_page(content: bytes, list_type: str, typed: bool = False, encoding: str = None) -> tuple:
+    # Meant for worker processes: the flat cells are the cheapest thing to send back, typed records are built there
+    # too as they cost more than the parse itself. Dicts are left to the caller.
+    cells = parse_details_cells(content, list_type, encoding)
+    return cells, build_details_rows(cells, list_type, True) if typed else None
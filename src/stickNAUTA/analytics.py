@@ -0,0 +1,153 @@
+from typing import (Any, Iterable, Sequence, Union)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .export import (to_numpy)
+
+PERIODS: tuple = ('hour', 'day', 'week', 'month')
+PERCENTILES: tuple = (50, 75, 90, 95, 99)
+DURATION_BINS: tuple = (0, 60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400)
+GIGABYTE: int = 1024 ** 3
+USAGE_COLUMNS: tuple = ('sessions', 'duration', 'upload_traffic', 'download_traffic', 'traffic', 'cost')
+
+
+def _to_array(history: Union[dict, Iterable, Any], fleet: bool = False) -> Any:
+    if numpy is None:
+        raise ImportError('stickNAUTA.analytics requires numpy. Install it with: pip install stickNAUTA[numpy]')
+
+    # Record arrays from to_numpy() (e.g. kept from a previous run) are used as they are, without parsing again. Any
+    # other history goes through the column at a time conversion of to_numpy(), never through per row records.
+    if isinstance(history, numpy.ndarray) and history.dtype.names is not None:
+        return history
+    return to_numpy(history, fleet)
+
+
+def _columns(sessions: Any) -> tuple:
+    # to_numpy() marks unknown integers with MISSING_INT and unknown costs with NaN, both count as 0 in sums.
+    upload = numpy.maximum(sessions['upload_traffic'], 0)
+    download = numpy.maximum(sessions['download_traffic'], 0)
+    duration = numpy.maximum(sessions['duration'], 0)
+    cost = numpy.nan_to_num(sessions['cost'])
+    return duration, upload, download, cost
+
+
+def _period_keys(starts: Any, period: str) -> Any:
+    if period == 'hour':
+        return starts.astype('datetime64[h]')
+    elif period == 'day':
+        return starts.astype('datetime64[D]')
+    elif period == 'week':
+        # datetime64 weeks start on Thursday (1970-01-01), so days are moved back to their Monday instead.
+        days = starts.astype('datetime64[D]')
+        return days - (days.astype('int64') + 3) % 7
+    elif period == 'month':
+        return starts.astype('datetime64[M]')
+    raise ValueError(f'period must be one of {PERIODS}.')
+
+
+def _aggregate(keys: Any, sessions: Any) -> tuple:
+    (duration, upload, download, cost) = _columns(sessions)
+    (unique_keys, inverse) = numpy.unique(keys, return_inverse=True)
+    length = len(unique_keys)
+
+    def total(values: Any) -> Any:
+        return numpy.bincount(inverse, weights=values, minlength=length)
+
+    return unique_keys, [
+        numpy.bincount(inverse, minlength=length),
+        total(duration).astype('int64'),
+        total(upload).astype('int64'),
+        total(download).astype('int64'),
+        total(upload + download).astype('int64'),
+        total(cost)
+    ]
+
+
+def get_usage(history: Union[dict, Iterable, Any], period: str = 'day', by_account: bool = False,
+              fleet: bool = False) -> Any:
+    # Usage per account is only there for a fleet, so by_account takes the history as one.
+    sessions = _to_array(history, fleet or by_account)
+    sessions = sessions[~numpy.isnat(sessions['start_datetime'])]
+    keys = _period_keys(sessions['start_datetime'], period)
+
+    if not by_account:
+        (periods, totals) = _aggregate(keys, sessions)
+        return numpy.rec.fromarrays([periods, *totals], names=[period, *USAGE_COLUMNS])
+
+    if 'account' not in sessions.dtype.names:
+        raise ValueError('by_account needs the history of a fleet (username: history).')
+
+    # Accounts and periods are turned into integer codes first and grouped on one combined int64 key, which sorts
+    # much faster than strings or (account, period) records.
+    (accounts, account_codes) = numpy.unique(sessions['account'], return_inverse=True)
+    (periods, period_codes) = numpy.unique(keys, return_inverse=True)
+    (combined, totals) = _aggregate(account_codes.astype('int64') * len(periods) + period_codes, sessions)
+    return numpy.rec.fromarrays([accounts[combined // len(periods)], periods[combined % len(periods)], *totals],
+                                names=['account', period, *USAGE_COLUMNS])
+
+
+def get_hourly_profile(history: Union[dict, Iterable, Any], fleet: bool = False) -> Any:
+    sessions = _to_array(history, fleet)
+    sessions = sessions[~numpy.isnat(sessions['start_datetime'])]
+    starts = sessions['start_datetime']
+    hours = (starts - starts.astype('datetime64[D]')).astype('timedelta64[h]').astype('int64')
+
+    (duration, upload, download, cost) = _columns(sessions)
+    return numpy.rec.fromarrays([
+        numpy.arange(24),
+        numpy.bincount(hours, minlength=24),
+        numpy.bincount(hours, weights=duration, minlength=24).astype('int64'),
+        numpy.bincount(hours, weights=upload + download, minlength=24).astype('int64'),
+        numpy.bincount(hours, weights=cost, minlength=24)
+    ], names=['hour', 'sessions', 'duration', 'traffic', 'cost'])
+
+
+def get_traffic_percentiles(history: Union[dict, Iterable, Any], percentiles: Sequence[float] = PERCENTILES,
+                            fleet: bool = False) -> dict:
+    sessions = _to_array(history, fleet)
+    (_, upload, download, _) = _columns(sessions)
+    if not len(sessions):
+        return {percentile: 0.0 for percentile in percentiles}
+
+    values = numpy.percentile(upload + download, percentiles)
+    return {percentile: float(value) for (percentile, value) in zip(percentiles, values)}
+
+
+def get_duration_histogram(history: Union[dict, Iterable, Any], bins: Sequence[int] = DURATION_BINS,
+                           fleet: bool = False) -> tuple:
+    sessions = _to_array(history, fleet)
+    durations = sessions['duration']
+    (counts, edges) = numpy.histogram(durations[durations >= 0], bins=bins)
+    return counts, edges
+
+
+def get_cost_rates(history: Union[dict, Iterable, Any], fleet: bool = False) -> dict:
+    sessions = _to_array(history, fleet)
+    (duration, upload, download, cost) = _columns(sessions)
+    (total_cost, total_traffic, total_duration) = (float(cost.sum()), int((upload + download).sum()),
+                                                   int(duration.sum()))
+    return {
+        'sessions': len(sessions),
+        'cost': total_cost,
+        'traffic': total_traffic,
+        'duration': total_duration,
+        'cost_per_gb': total_cost / (total_traffic / GIGABYTE) if total_traffic else None,
+        'cost_per_hour': total_cost / (total_duration / 3600) if total_duration else None
+    }
+
+
+def get_top_accounts(history: Union[dict, Any], by: str = 'traffic', limit: int = 10) -> list:
+    if by not in USAGE_COLUMNS:
+        raise ValueError(f'by must be one of {USAGE_COLUMNS}.')
+
+    sessions = _to_array(history, fleet=True)
+    if 'account' not in sessions.dtype.names:
+        raise ValueError('get_top_accounts needs the history of a fleet (username: history).')
+
+    (accounts, totals) = _aggregate(sessions['account'], sessions)
+    values = totals[USAGE_COLUMNS.index(by)]
+    order = numpy.argsort(-values, kind='stable')[:limit]
+    return [(str(accounts[index]), values[index].item()) for index in order]
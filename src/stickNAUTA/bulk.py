@@ -0,0 +1,359 @@
+from __future__ import (annotations)
+
+from asyncio import (AbstractEventLoop, all_tasks, gather, new_event_loop, run_coroutine_threadsafe)
+from contextlib import (contextmanager, nullcontext)
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait)
+from dataclasses import (dataclass, field)
+from inspect import (isawaitable)
+from multiprocessing import (get_context)
+from threading import (Thread)
+from time import (sleep)
+from typing import (Callable, Iterable, Iterator, Optional, Tuple, Union)
+
+from .HistoryStore import (HistoryStore)
+from .NautaFleet import (FleetReport)
+from .PortalNauta import (PortalError, PortalNauta)
+from .RequestScheduler import (RequestScheduler)
+from .RequestStats import (Hooks)
+from .TransportPolicy import (TransportPolicy)
+
+DETAILS_KINDS: tuple = ('connection', 'recharge', 'transfer')
+
+
+@dataclass
+class RechargeReport(object):
+    recharged: dict = field(default_factory=dict)
+    failures: dict = field(default_factory=dict)
+    rejected: dict = field(default_factory=dict)
+    duplicates: list = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures and not self.rejected
+
+    def get_errors(self) -> dict:
+        return {code: _describe(exception) for (code, exception) in {**self.rejected, **self.failures}.items()}
+
+
+@dataclass
+class TransferReport(object):
+    balance: float = 0.0
+    planned: dict = field(default_factory=dict)
+    transferred: dict = field(default_factory=dict)
+    failures: dict = field(default_factory=dict)
+    rejected: dict = field(default_factory=dict)
+    dry_run: bool = False
+    # How much the plan goes over the available balance, only ever set by a dry run (a real run raises instead).
+    shortfall: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures and not self.rejected and not self.shortfall
+
+    @property
+    def remaining_balance(self) -> float:
+        return round(self.balance - sum(self.transferred.values()), 2)
+
+    def get_errors(self) -> dict:
+        return {target: _describe(exception) for (target, exception) in {**self.rejected, **self.failures}.items()}
+
+
+def _describe(exception: Exception) -> Tuple[str, str]:
+    if isinstance(exception, PortalError):
+        return exception.error, exception.description
+    # KeyError quotes its message when converted to str(), so single messages are taken as they were given.
+    return type(exception).__name__, str(exception.args[0]) if len(exception.args) == 1 else str(exception)
+
+
+def _check_recharge_code(recharge_code: str) -> None:
+    if not recharge_code.isdigit():
+        raise ValueError('recharge_code chars must be all digits.')
+    elif not 12 <= len(recharge_code) <= 16:
+        raise ValueError('recharge_code must be between 12 and 16 digits long.')
+
+
+def _get_portals(portals: Iterable[PortalNauta]) -> dict:
+    portals = list(portals)
+    for portal in portals:
+        if not isinstance(portal, PortalNauta):
+            raise TypeError('portals must be an iterable of PortalNauta().')
+    return {portal.username: portal for portal in portals}
+
+
+def _run_account(portal: PortalNauta, operation: str, arguments: list) -> list:
+    # Operations of one account share its CSRF token, so they run one after another in the order given.
+    outcomes = []
+    for argument in arguments:
+        try:
+            outcomes.append((argument, getattr(portal, operation)(*argument), None))
+        except Exception as exception:
+            outcomes.append((argument, None, exception))
+    return outcomes
+
+
+def recharge_accounts(portals: Iterable[PortalNauta], recharges: Iterable[Tuple[str, str]],
+                      max_workers: int = 4) -> RechargeReport:
+    if not type(max_workers) is int:
+        raise TypeError('max_workers must be an int().')
+    elif max_workers < 1:
+        raise ValueError('max_workers must be greater than 0.')
+
+    portals = _get_portals(portals)
+    report = RechargeReport()
+
+    # Every pair is checked before the first code is posted, so a bad batch does not spend half of its codes.
+    (accounts, seen) = ({}, set())
+    for recharge in recharges:
+        if not isinstance(recharge, (tuple, list)) or len(recharge) != 2:
+            raise TypeError('recharges must be an iterable of (username, recharge_code) pairs.')
+        elif type(recharge[1]) is not str:
+            raise TypeError('recharge_code must be a str().')
+
+        (username, recharge_code) = recharge
+        if recharge_code in seen:
+            report.duplicates.append((username, recharge_code))
+            continue
+        seen.add(recharge_code)
+
+        try:
+            _check_recharge_code(recharge_code)
+            portal = portals.get(username)
+            if portal is None:
+                raise KeyError(f'There is no PortalNauta for account "{username}".')
+            elif not portal.logged_in:
+                raise RuntimeError(f'PortalNauta of account "{username}" has not submitted a valid CAPTCHA.')
+        except Exception as exception:
+            report.rejected[recharge_code] = exception
+            continue
+
+        accounts.setdefault(username, []).append(recharge_code)
+
+    if not accounts:
+        return report
+
+    with ThreadPoolExecutor(min(max_workers, len(accounts))) as executor:
+        futures = [(username, executor.submit(_run_account, portals[username], 'recharge_account',
+                                              [(recharge_code,) for recharge_code in recharge_codes]))
+                   for (username, recharge_codes) in accounts.items()]
+
+    for (username, future) in futures:
+        for ((recharge_code,), _, exception) in future.result():
+            if exception is None:
+                report.recharged[recharge_code] = username
+            else:
+                report.failures[recharge_code] = exception
+    return report
+
+
+def transfer_balances(portal: PortalNauta, plan: dict, interval: Union[int, float] = 1.0,
+                      dry_run: bool = False) -> TransferReport:
+    if not isinstance(portal, PortalNauta):
+        raise TypeError('portal must be a PortalNauta().')
+    elif not isinstance(plan, dict):
+        raise TypeError('plan must be a dict() of target_account: amount.')
+    elif type(interval) not in (int, float):
+        raise TypeError('interval must be an int() or float() of seconds.')
+    elif interval < 0:
+        raise ValueError('interval must not be negative.')
+    elif not portal.logged_in:
+        raise AttributeError('This method is not available until a valid CAPTCHA is submitted!')
+
+    report = TransferReport(dry_run=dry_run)
+    for (target_account, amount) in plan.items():
+        try:
+            if type(target_account) is not str:
+                raise TypeError('target_account must be a str().')
+            elif type(amount) not in (int, float):
+                raise TypeError('amount must be an int() or float().')
+            elif not target_account.endswith(('@nauta.com.cu', '@nauta.co.cu')):
+                raise ValueError('target_account is not valid. It must end with @nauta.com.cu or @nauta.co.cu.')
+            elif target_account == portal.username:
+                raise ValueError('target_account must not be the source account.')
+            elif amount <= 0 or round(amount, 2) != amount:
+                raise ValueError('amount must be greater than 0 with at most 2 decimals.')
+        except Exception as exception:
+            report.rejected[target_account] = exception
+            continue
+
+        report.planned[target_account] = float(amount)
+
+    # The balance is read once for the whole plan. A plan that does not fit is refused before anything is spent
+    # instead of leaving the last targets without their share.
+    balance = portal.get_account_data(refresh=True, typed=True).available_balance
+    if balance is None:
+        raise RuntimeError('Failed to read the available balance of the account.')
+    report.balance = balance
+
+    # A dry run is asked for to find out whether the plan fits, so the missing amount is reported instead of raised.
+    total = round(sum(report.planned.values()), 2)
+    if total > balance and dry_run:
+        report.shortfall = round(total - balance, 2)
+    elif total > balance:
+        raise ValueError(f'plan needs {total:.2f} but the account only has {balance:.2f} available.')
+
+    if dry_run:
+        return report
+
+    for (index, (target_account, amount)) in enumerate(report.planned.items()):
+        if index and interval:
+            sleep(interval)
+
+        try:
+            portal.transfer_balance(target_account, amount)
+        except Exception as exception:
+            report.failures[target_account] = exception
+        else:
+            report.transferred[target_account] = amount
+    return report
+
+
+@contextmanager
+def _solver_loop() -> Iterator[AbstractEventLoop]:
+    # Async solvers often keep loop bound state (an aiohttp session, a client, a semaphore), so every batch of a
+    # login_portals call runs on this one loop, in a thread of its own, instead of a new loop per batch. Whatever the
+    # solver left pending is cancelled and the loop closed when the call is done.
+    loop = new_event_loop()
+    thread = Thread(target=loop.run_forever, name='stickNAUTA-solver', daemon=True)
+    thread.start()
+    try:
+        yield loop
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        pending = all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(gather(*pending, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+async def _resolve(answers: list) -> list:
+    results = iter(await gather(*[answer for answer in answers if isawaitable(answer)]))
+    return [next(results) if isawaitable(answer) else answer for answer in answers]
+
+
+def _solve(solver: Callable, images: list, batched: bool, loop: AbstractEventLoop) -> list:
+    # Solvers may be sync or async and may take one image or a whole batch, awaitables are run to completion here.
+    answers = [solver(images)] if batched else [solver(image) for image in images]
+    if any(isawaitable(answer) for answer in answers):
+        answers = run_coroutine_threadsafe(_resolve(answers), loop).result()
+    answers = list(answers[0]) if batched else answers
+
+    if len(answers) != len(images):
+        raise ValueError(f'solver returned {len(answers)} answers for {len(images)} CAPTCHAs.')
+    return answers
+
+
+def _fetch_captcha(username: str, password: str, portal: Optional[PortalNauta], portal_kwargs: dict) -> tuple:
+    if portal is None:
+        portal = PortalNauta(username, password, prefetch_captcha=True, **portal_kwargs)
+    return portal, portal.get_captcha_image()
+
+
+def login_portals(accounts: dict, solver: Callable, batch_size: int = 8, batched: bool = True, max_workers: int = 8,
+                  attempts: int = 3, lang_english: bool = True, base_url: str = 'https://www.portal.nauta.cu/',
+                  hooks: Hooks = None, transport: TransportPolicy = None,
+                  scheduler: RequestScheduler = None) -> FleetReport:
+    if not isinstance(accounts, dict):
+        raise TypeError('accounts must be a dict() of username: password.')
+    elif not callable(solver):
+        raise TypeError('solver must be callable.')
+    elif type(batch_size) is not int or type(max_workers) is not int or type(attempts) is not int:
+        raise TypeError('batch_size, max_workers and attempts must be an int().')
+    elif batch_size < 1 or max_workers < 1 or attempts < 1:
+        raise ValueError('batch_size, max_workers and attempts must be greater than 0.')
+
+    if transport is None:
+        transport = TransportPolicy(pool_maxsize=max(16, max_workers), shared=True)
+
+    portal_kwargs = {'lang_english': lang_english, 'base_url': base_url, 'hooks': hooks, 'transport': transport,
+                     'scheduler': scheduler}
+    (report, submitted, ready) = (FleetReport(), dict.fromkeys(accounts.keys(), 0), [])
+
+    with _solver_loop() as loop, ThreadPoolExecutor(max_workers) as executor:
+        futures = {executor.submit(_fetch_captcha, username, password, None, portal_kwargs): ('fetch', username, None)
+                   for (username, password) in accounts.items()}
+
+        while futures:
+            (done, _) = wait(futures.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                (stage, username, payload) = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exception:
+                    if stage == 'solve':
+                        report.failures.update({username: exception for (username, _, _) in payload})
+                    elif stage == 'submit' and isinstance(exception, PortalError) and submitted[username] < attempts:
+                        futures[executor.submit(_fetch_captcha, username, accounts[username], payload,
+                                                portal_kwargs)] = ('fetch', username, None)
+                    else:
+                        report.failures[username] = exception
+                    continue
+
+                if stage == 'fetch':
+                    ready.append((username, *result))
+                elif stage == 'solve':
+                    for ((username, portal, _), answer) in zip(payload, result):
+                        submitted[username] += 1
+                        futures[executor.submit(portal.submit_captcha, answer)] = ('submit', username, portal)
+                else:
+                    report.results[username] = payload
+
+            # Batches go to the solver as soon as they are full, or with whatever is left once nothing is fetching.
+            fetching = any(stage == 'fetch' for (stage, _, _) in futures.values())
+            while len(ready) >= batch_size or (ready and not fetching):
+                (batch, ready) = (ready[:batch_size], ready[batch_size:])
+                futures[executor.submit(_solve, solver, [image for (_, _, image) in batch], batched, loop)] = \
+                    ('solve', None, batch)
+
+    report.results = {username: report.results[username] for username in accounts if username in report.results}
+    report.failures = {username: report.failures[username] for username in accounts if username in report.failures}
+    return report
+
+
+def get_fleet_details(portals: Iterable[PortalNauta], details: str = 'connection', typed: bool = False,
+                      max_workers: int = 8, page_workers: int = 2, processes: int = None,
+                      store: HistoryStore = None) -> FleetReport:
+    if details not in DETAILS_KINDS:
+        raise ValueError(f'details must be one of {DETAILS_KINDS}.')
+    elif type(max_workers) is not int or type(page_workers) is not int:
+        raise TypeError('max_workers and page_workers must be an int().')
+    elif processes is not None and type(processes) is not int:
+        raise TypeError('processes must be an int().')
+    elif max_workers < 1 or page_workers < 1 or (processes is not None and processes < 1):
+        raise ValueError('max_workers, page_workers and processes must be greater than 0.')
+    elif store is not None and not isinstance(store, HistoryStore):
+        raise TypeError('store must be a HistoryStore().')
+    elif store is not None and typed:
+        raise ValueError('typed records cannot be synced into a HistoryStore, it keeps plain rows.')
+
+    portals = _get_portals(portals)
+    report = FleetReport()
+    if not portals:
+        return report
+
+    # Fetching stays on threads, max_workers accounts with page_workers pages each in flight, while every page is
+    # parsed in the process pool, so lxml and the row building use all cores instead of one GIL.
+    # A shared store is saved once when every account is done instead of once per account.
+    # The parse workers are spawned, not forked: the pool starts them on the first submit, from a fetch thread, while
+    # the other fetch threads may hold urllib3 or lxml locks that a forked child would inherit locked forever.
+    with ProcessPoolExecutor(processes, mp_context=get_context('spawn')) as parse_executor, \
+            ThreadPoolExecutor(min(max_workers, len(portals))) as executor, \
+            (nullcontext() if store is None else store.batch()):
+        if store is None:
+            futures = {username: executor.submit(getattr(portal, f'get_{details}_details'), page_workers, typed,
+                                                 parse_executor)
+                       for (username, portal) in portals.items()}
+        else:
+            futures = {username: executor.submit(getattr(portal, f'sync_{details}_details'), store, page_workers,
+                                                 parse_executor)
+                       for (username, portal) in portals.items()}
+
+        for (username, future) in futures.items():
+            try:
+                report.results[username] = future.result()
+            except Exception as exception:
+                report.failures[username] = exception
+    return report
@@ -0,0 +1,310 @@
+from collections.abc import (Mapping)
+from datetime import (datetime)
+from re import (compile as re_compile)
+from typing import (Any, Callable, Iterable, Optional, Union)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    from pyarrow import (parquet)
+except ImportError:
+    pyarrow = parquet = None
+
+from ._parsing import (DATETIME_FORMATS, TRAFFIC_UNITS, to_bytes, to_connection_session, to_datetime, to_number,
+                       to_seconds)
+from .records import (ConnectionSession)
+
+SESSION_COLUMNS: tuple = ('start_datetime', 'end_datetime', 'duration', 'upload_traffic', 'download_traffic', 'cost')
+ROW_KEYS: tuple = ('start_datetime', 'end_datetime', 'duration', 'upload_traffic', 'download_traffic', 'import')
+MISSING_INT: int = -1
+DURATION_FORMAT: str = '%H:%M:%S'
+DIRECTIVE_WIDTHS: dict = {'Y': 4, 'm': 2, 'd': 2, 'H': 2, 'M': 2, 'S': 2}
+FORMAT_TOKENS_REGEX = re_compile(r'%([YmdHMS])|(.)')
+
+
+def _iter_rows(history: Union[dict, Iterable]) -> Iterable[Union[dict, ConnectionSession]]:
+    return (row for month in history.values() for row in month['all_sessions']) \
+        if isinstance(history, Mapping) else history
+
+
+def _iter_sessions(history: Union[dict, Iterable]) -> Iterable[ConnectionSession]:
+    for row in _iter_rows(history):
+        if isinstance(row, ConnectionSession):
+            yield row
+        else:
+            yield to_connection_session(*[row[key] for key in ROW_KEYS])
+
+
+def _check_fleet(history: Union[dict, Iterable], fleet: bool) -> None:
+    if fleet and not isinstance(history, Mapping):
+        raise TypeError('history of a fleet must be a dict() of username: history.')
+
+
+def _get_raw_columns(history: Union[dict, Iterable]) -> Optional[list]:
+    # The stored strings of every column, or None when rows are typed records and so already converted.
+    rows = list(_iter_rows(history))
+    if ConnectionSession in set(map(type, rows)):
+        return None
+    return [[row[key] for row in rows] for key in ROW_KEYS]
+
+
+def _to_codes(values: list) -> tuple:
+    # One row of UTF-32 code points per value (NUL padded), so every value is converted by whole array operations.
+    array = numpy.array(values, dtype=str)
+    codes = array.view(numpy.uint32).reshape(len(values), array.dtype.itemsize // 4)
+    return codes.astype('int32'), (codes != 0).sum(axis=1)
+
+
+def _read_digits(codes: Any, start: int, width: int) -> tuple:
+    digits = codes[:, start:start + width] - 48
+    return digits @ 10 ** numpy.arange(width - 1, -1, -1), ((digits >= 0) & (digits <= 9)).all(axis=1)
+
+
+def _parse_fixed_width(codes: Any, lengths: Any, layout: str) -> tuple:
+    # Values written with a strptime layout of zero padded fields (e.g. '%d/%m/%Y %H:%M') are split by position.
+    tokens = [(directive, char) for (directive, char) in FORMAT_TOKENS_REGEX.findall(layout)]
+    width = sum(DIRECTIVE_WIDTHS[directive] if directive else 1 for (directive, _) in tokens)
+    if codes.shape[1] < width:
+        return {}, numpy.zeros(len(codes), dtype=bool)
+
+    (fields, matched, position) = ({}, lengths == width, 0)
+    for (directive, char) in tokens:
+        if directive:
+            (fields[directive], valid) = _read_digits(codes, position, DIRECTIVE_WIDTHS[directive])
+            matched &= valid
+            position += DIRECTIVE_WIDTHS[directive]
+        else:
+            matched &= codes[:, position] == ord(char)
+            position += 1
+    return fields, matched
+
+
+def _detect_datetime_format(values: list) -> Optional[str]:
+    sample = next((value.strip() for value in values if any(char.isdigit() for char in value)), None)
+    for datetime_format in DATETIME_FORMATS if sample is not None else ():
+        try:
+            datetime.strptime(sample, datetime_format)
+            return datetime_format
+        except ValueError:
+            pass
+    return None
+
+
+def _fall_back(result: Any, values: list, mask: Any, converter: Callable, missing: Any) -> Any:
+    # Values off the column layout go through the scalar converter, which raises for the same input as it always did.
+    for index in numpy.flatnonzero(mask):
+        value = converter(values[index])
+        result[index] = missing if value is None else value
+    return result
+
+
+def _to_datetime64(values: list) -> Any:
+    # The layout is found once per column from its first value, values written otherwise are left to to_datetime().
+    (codes, lengths) = _to_codes(values)
+    datetime_format = _detect_datetime_format(values)
+    if datetime_format is None:
+        (fields, matched) = ({}, numpy.zeros(len(values), dtype=bool))
+    else:
+        (fields, matched) = _parse_fixed_width(codes, lengths, datetime_format)
+
+    result = numpy.full(len(values), numpy.datetime64('NaT'), dtype='datetime64[s]')
+    if matched.any():
+        (years, months, days) = (fields['Y'], fields['m'], fields['d'])
+        (hours, minutes, seconds) = (fields.get(directive, 0) for directive in 'HMS')
+        month_starts = ((years - 1970) * 12 + months - 1).astype('datetime64[M]')
+        month_days = ((month_starts + 1).astype('datetime64[D]') - month_starts.astype('datetime64[D]')).astype(int)
+        matched &= (1 <= months) & (months <= 12) & (1 <= days) & (days <= month_days) & (hours < 24) & \
+            (minutes < 60) & (seconds < 60)
+
+        datetimes = month_starts.astype('datetime64[s]') + ((days - 1) * 86400 + hours * 3600 + minutes * 60 +
+                                                            seconds).astype('timedelta64[s]')
+        result[matched] = datetimes[matched]
+
+    return _fall_back(result, values, ~matched, to_datetime, numpy.datetime64('NaT'))
+
+
+def _to_seconds(values: list) -> Any:
+    (codes, lengths) = _to_codes(values)
+    (fields, matched) = _parse_fixed_width(codes, lengths, DURATION_FORMAT)
+
+    result = numpy.full(len(values), MISSING_INT, dtype='int64')
+    if matched.any():
+        result[matched] = (fields['H'] * 3600 + fields['M'] * 60 + fields['S'])[matched]
+    return _fall_back(result, values, ~matched, to_seconds, MISSING_INT)
+
+
+def _to_numbers(values: list, units: bool = False) -> tuple:
+    # Only plain numbers are read here: digits with at most one separator (the decimal one), maybe after a minus.
+    # Anything else between the first and the last digit (several separators of any kind, blanks, other chars), a
+    # separator before the first digit or more digits than a float holds exactly is left to to_number().
+    (codes, lengths) = _to_codes(values)
+    (count, width) = codes.shape
+    if not width:
+        return numpy.full(count, numpy.nan), numpy.ones(count, dtype=bool), numpy.ones(count, dtype='int64')
+
+    (rows, columns) = (numpy.arange(count), numpy.arange(width))
+    digit = (codes >= 48) & (codes <= 57)
+    (comma, dot) = (codes == 44, codes == 46)
+    has_digits = digit.any(axis=1)
+    first = digit.argmax(axis=1)
+    last = width - 1 - digit[:, ::-1].argmax(axis=1)
+    in_number = (columns >= first[:, None]) & (columns <= last[:, None])
+
+    separator = (comma | dot) & in_number
+    number_digits = digit & in_number
+    before = numpy.where(first > 0, codes[rows, first - 1], 0)
+    fallback = has_digits & ((in_number & ~digit & ~separator).any(axis=1) | (separator.sum(axis=1) > 1) |
+                             (before == 44) | (before == 46) | (number_digits.sum(axis=1) > 15))
+
+    has_separator = separator.any(axis=1)
+    decimal = width - 1 - separator[:, ::-1].argmax(axis=1)
+    digits_right = number_digits[:, ::-1].cumsum(axis=1)[:, ::-1] - number_digits
+    decimals = numpy.where(has_separator, digits_right[rows, decimal], 0)
+
+    mantissa = numpy.where(number_digits, (codes - 48) * 10.0 ** digits_right, 0.0).sum(axis=1)
+    numbers = numpy.where(has_digits, mantissa / 10.0 ** decimals, numpy.nan)
+    numbers = numpy.where(before == 45, -numbers, numbers)
+
+    multipliers = numpy.ones(count, dtype='int64')
+    if units:
+        # ([KMGT]?B)\s*$ on the upper cased value: the last non blank char is a B, maybe after a unit prefix.
+        upper = numpy.where((codes >= 97) & (codes <= 122), codes - 32, codes)
+        blank = (codes == 0) | (codes == 32) | ((codes >= 9) & (codes <= 13))
+        end = width - 1 - (~blank)[:, ::-1].argmax(axis=1)
+        prefix = numpy.where(end > 0, upper[rows, end - 1], 0)
+        is_bytes = (upper[rows, end] == ord('B')) & (~blank).any(axis=1)
+        for unit in ('KB', 'MB', 'GB', 'TB'):
+            multipliers[is_bytes & (prefix == ord(unit[0]))] = TRAFFIC_UNITS[unit]
+    return numbers, fallback, multipliers
+
+
+def _to_bytes(values: list) -> Any:
+    (numbers, fallback, multipliers) = _to_numbers(values, units=True)
+    result = numpy.where(numpy.isnan(numbers), MISSING_INT,
+                         numpy.round(numpy.nan_to_num(numbers) * multipliers)).astype('int64')
+    return _fall_back(result, values, fallback, to_bytes, MISSING_INT)
+
+
+def _to_floats(values: list) -> Any:
+    (numbers, fallback, _) = _to_numbers(values)
+    return _fall_back(numbers, values, fallback, to_number, numpy.nan)
+
+
+def _to_arrays(history: Union[dict, Iterable], fleet: bool = False) -> dict:
+    _check_fleet(history, fleet)
+    if fleet:
+        accounts = [(account, _to_arrays(account_history)) for (account, account_history) in history.items()]
+        arrays = {name: numpy.concatenate([account_arrays[name] for (_, account_arrays) in accounts])
+                  for name in SESSION_COLUMNS}
+        return {'account': numpy.repeat(numpy.array([account for (account, _) in accounts], dtype='U'),
+                                        [len(account_arrays['cost']) for (_, account_arrays) in accounts]),
+                **arrays}
+
+    raw_columns = _get_raw_columns(history)
+    if raw_columns is None:
+        columns = _to_python_columns(history)
+        return {
+            'start_datetime': numpy.array(columns['start_datetime'], dtype='datetime64[s]'),
+            'end_datetime': numpy.array(columns['end_datetime'], dtype='datetime64[s]'),
+            **{name: numpy.array([MISSING_INT if value is None else value for value in columns[name]], dtype='int64')
+               for name in ('duration', 'upload_traffic', 'download_traffic')},
+            'cost': numpy.array([numpy.nan if value is None else value for value in columns['cost']], dtype='float64')
+        }
+
+    (starts, ends, durations, uploads, downloads, costs) = raw_columns
+    return {
+        'start_datetime': _to_datetime64(starts),
+        'end_datetime': _to_datetime64(ends),
+        'duration': _to_seconds(durations),
+        'upload_traffic': _to_bytes(uploads),
+        'download_traffic': _to_bytes(downloads),
+        'cost': _to_floats(costs)
+    }
+
+
+def _to_python_columns(history: Union[dict, Iterable]) -> dict:
+    columns = {name: [] for name in SESSION_COLUMNS}
+    appends = [columns[name].append for name in SESSION_COLUMNS]
+    for session in _iter_sessions(history):
+        for (append, name) in zip(appends, SESSION_COLUMNS):
+            append(getattr(session, name))
+    return columns
+
+
+def to_columns(history: Union[dict, Iterable], fleet: bool = False) -> dict:
+    # fleet=True takes a dict of username: history (as NautaFleet and bulk.get_fleet_details return) and adds an
+    # account column.
+    _check_fleet(history, fleet)
+    if numpy is not None:
+        # Missing values come back as None, as the typed records have them.
+        columns = {}
+        for (name, array) in _to_arrays(history, fleet).items():
+            if array.dtype.kind == 'M':
+                columns[name] = array.astype(object).tolist()
+            elif array.dtype.kind == 'i':
+                columns[name] = [None if value == MISSING_INT else value for value in array.tolist()]
+            elif array.dtype.kind == 'f':
+                columns[name] = [None if value != value else value for value in array.tolist()]
+            else:
+                columns[name] = array.tolist()
+        return columns
+
+    if fleet:
+        columns = {name: [] for name in ('account', *SESSION_COLUMNS)}
+        for (account, account_history) in history.items():
+            account_columns = to_columns(account_history)
+            columns['account'].extend([account] * len(account_columns['cost']))
+            for name in SESSION_COLUMNS:
+                columns[name].extend(account_columns[name])
+        return columns
+    return _to_python_columns(history)
+
+
+def to_numpy(history: Union[dict, Iterable], fleet: bool = False) -> Any:
+    if numpy is None:
+        raise ImportError('to_numpy requires numpy. Install it with: pip install stickNAUTA[numpy]')
+
+    arrays = _to_arrays(history, fleet)
+    return numpy.rec.fromarrays(list(arrays.values()), names=list(arrays.keys()))
+
+
+def to_arrow(history: Union[dict, Iterable], fleet: bool = False) -> Any:
+    if pyarrow is None:
+        raise ImportError('to_arrow requires pyarrow. Install it with: pip install stickNAUTA[arrow]')
+
+    types = {
+        'account': pyarrow.string(),
+        'start_datetime': pyarrow.timestamp('s'),
+        'end_datetime': pyarrow.timestamp('s'),
+        'duration': pyarrow.int64(),
+        'upload_traffic': pyarrow.int64(),
+        'download_traffic': pyarrow.int64(),
+        'cost': pyarrow.float64()
+    }
+    if numpy is None:
+        columns = to_columns(history, fleet)
+        return pyarrow.table({name: pyarrow.array(values, type=types[name]) for (name, values) in columns.items()})
+
+    def get_mask(array: Any) -> Any:
+        if array.dtype.kind == 'M':
+            return numpy.isnat(array)
+        elif array.dtype.kind == 'i':
+            return array == MISSING_INT
+        elif array.dtype.kind == 'f':
+            return numpy.isnan(array)
+        return None
+
+    return pyarrow.table({name: pyarrow.array(array, type=types[name], mask=get_mask(array))
+                          for (name, array) in _to_arrays(history, fleet).items()})
+
+
+def to_parquet(history: Union[dict, Iterable], file_path: str, fleet: bool = False, **kwargs) -> None:
+    if type(file_path) is not str:
+        raise TypeError('file_path must be a str().')
+
+    table = to_arrow(history, fleet)
+    parquet.write_table(table, file_path, **kwargs)
@@ -0,0 +1,65 @@
+from __future__ import (annotations)
+
+from dataclasses import (dataclass)
+from datetime import (datetime)
+from typing import (Optional, Tuple)
+
+
+@dataclass
+class UserSession(object):
+    __slots__ = ('start', 'end', 'duration')
+    start: Optional[datetime]
+    end: Optional[datetime]
+    duration: Optional[int]
+
+
+@dataclass
+class UserInfo(object):
+    __slots__ = ('account_state', 'credit', 'expiration_date', 'access_areas', 'sessions')
+    account_state: str
+    credit: Optional[float]
+    expiration_date: Optional[datetime]
+    access_areas: str
+    sessions: Tuple[UserSession, ...]
+
+
+@dataclass
+class AccountData(object):
+    __slots__ = ('username', 'blocking_date', 'elimination_date', 'account_type', 'service_type',
+                 'available_balance', 'remaining_time', 'email_account')
+    username: str
+    blocking_date: Optional[datetime]
+    elimination_date: Optional[datetime]
+    account_type: str
+    service_type: str
+    available_balance: Optional[float]
+    remaining_time: Optional[int]
+    email_account: str
+
+
+@dataclass
+class ConnectionSession(object):
+    __slots__ = ('start_datetime', 'end_datetime', 'duration', 'upload_traffic', 'download_traffic', 'cost')
+    start_datetime: Optional[datetime]
+    end_datetime: Optional[datetime]
+    duration: Optional[int]
+    upload_traffic: Optional[int]
+    download_traffic: Optional[int]
+    cost: Optional[float]
+
+
+@dataclass
+class Recharge(object):
+    __slots__ = ('datetime', 'amount', 'channel', 'type')
+    datetime: Optional[datetime]
+    amount: Optional[float]
+    channel: str
+    type: str
+
+
+@dataclass
+class Transfer(object):
+    __slots__ = ('datetime', 'amount', 'target_account')
+    datetime: Optional[datetime]
+    amount: Optional[float]
+    target_account: str